@@ -1,25 +1,99 @@
-from mcp.server.fastmcp import FastMCP
-from helper import create_ec2_instance, terminate_ec2_instance
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from mcp.server.fastmcp import Context, FastMCP
+from helper import (
+    EC2_MAX_DESCRIBE_PER_CALL,
+    EC2_MAX_INSTANCES_PER_REQUEST,
+    EC2_MAX_TERMINATE_PER_CALL,
+    chunk_ids,
+    create_ec2_instance,
+    create_ec2_instances,
+    describe_instance_states,
+    find_instance_ids_by_tags,
+    get_ec2_call_stats,
+    inventory,
+    warm_pool,
+    terminate_ec2_instance,
+    terminate_ec2_instance_chunk,
+)
 
 
 # Initialize FastMCP server
 mcp = FastMCP("aws")
 
+# boto3 is synchronous, so every EC2 call is pushed onto a bounded thread pool
+# instead of running on the FastMCP event loop. EC2_MAX_CONCURRENCY caps how
+# many EC2 calls can be in flight at the same time.
+EC2_MAX_CONCURRENCY = int(os.getenv("EC2_MAX_CONCURRENCY", "8"))
+ec2_executor = ThreadPoolExecutor(
+    max_workers=EC2_MAX_CONCURRENCY, thread_name_prefix="ec2"
+)
+
+
+async def run_ec2_call(func, *args, **kwargs):
+    """
+    Runs a blocking EC2 helper on the EC2 thread pool and awaits its result,
+    so overlapping tool calls do not stall each other.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ec2_executor, partial(func, *args, **kwargs))
+
 
 @mcp.tool()
-async def initiate_aws_ec2_instance():
+async def initiate_aws_ec2_instance(idempotency_key: str | None = None):
     """
     Initiates the AWS EC2 instance creation process.
-    This function doesn't take any arguments and is called when the script is run.
+
+    Args:
+        idempotency_key: Optional key identifying this launch. Calling the tool again
+            with the same key returns the already created instance instead of
+            launching a new one.
     """
     print("Initiating AWS EC2 instance creation...")
-    instance_id = create_ec2_instance()
+    instance_id = await run_ec2_call(create_ec2_instance, idempotency_key)
     if instance_id:
         return f"EC2 instance created with ID: {instance_id}"
     else:
         return "Failed to create EC2 instance. Please check the logs for more details."
 
 
+@mcp.tool()
+async def initiate_aws_ec2_instances(
+    count: int,
+    tags: dict[str, str] | None = None,
+    instance_tags: list[dict[str, str]] | None = None,
+    idempotency_key: str | None = None,
+):
+    """
+    Creates several AWS EC2 instances in one call.
+    Use this instead of calling initiate_aws_ec2_instance repeatedly when the user
+    asks for more than one instance.
+
+    Args:
+        count: Number of instances to create. Counts above the configured maximum
+            (20 by default) are refused.
+        tags: Optional tags applied to every instance.
+        instance_tags: Optional list of per-instance tags; the n-th entry is applied
+            to the n-th created instance.
+        idempotency_key: Optional key identifying this batch. Calling the tool again
+            with the same key returns the already created instances.
+    """
+    print(f"Initiating creation of {count} AWS EC2 instances...")
+    if count < 1:
+        return "The number of instances to create must be at least 1."
+    if count > EC2_MAX_INSTANCES_PER_REQUEST:
+        return (
+            f"At most {EC2_MAX_INSTANCES_PER_REQUEST} instances can be created in one call."
+        )
+
+    return await run_ec2_call(
+        create_ec2_instances, count, tags, instance_tags, idempotency_key
+    )
+
+
 @mcp.tool()
 async def terminate_aws_ec2_instance(instance_id: str):
     """
@@ -30,17 +104,181 @@ async def terminate_aws_ec2_instance(instance_id: str):
     # Replace 'your_instance_id' with the actual instance ID you want to terminate
 
     if instance_id:
-        terminate_ec2_instance(instance_id)
-        return f"EC2 instance with ID: {instance_id} has been terminated."
+        if await run_ec2_call(terminate_ec2_instance, instance_id):
+            return f"EC2 instance with ID: {instance_id} has been terminated."
+        return f"Failed to terminate EC2 instance with ID: {instance_id}. Please check the logs for more details."
     else:
         return (
             "No instance ID provided. Please provide a valid instance ID to terminate."
         )
 
 
+@mcp.tool()
+async def terminate_aws_ec2_instances(
+    instance_ids: list[str] | None = None,
+    tags: dict[str, str] | None = None,
+):
+    """
+    Terminates several AWS EC2 instances in one call.
+    Use this instead of calling terminate_aws_ec2_instance repeatedly when the user
+    asks to terminate more than one instance.
+
+    Args:
+        instance_ids: IDs of the instances to terminate.
+        tags: Terminate every running or stopped instance carrying all of these tags.
+
+    Returns a per-instance summary of the previous and current state, or the
+    error that prevented the termination of that instance.
+    """
+    print("Terminating AWS EC2 instances...")
+    ids = list(instance_ids or [])
+    if tags:
+        try:
+            ids.extend(await run_ec2_call(find_instance_ids_by_tags, tags))
+        except Exception as e:
+            return f"Failed to look up instances by tags: {e}"
+
+    # Drop duplicates while keeping the caller's order
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return "No instances to terminate. Please provide instance IDs or tags."
+
+    summaries = await asyncio.gather(
+        *(
+            run_ec2_call(terminate_ec2_instance_chunk, chunk)
+            for chunk in chunk_ids(ids, EC2_MAX_TERMINATE_PER_CALL)
+        )
+    )
+
+    result = {}
+    for summary in summaries:
+        result.update(summary)
+    return result
+
+
+@mcp.tool()
+async def list_aws_ec2_instances(state: str | None = None, refresh: bool = False):
+    """
+    Lists the AWS EC2 instances of the configured region.
+    The list is served from a short-lived cache, pass refresh=True to force a
+    fresh listing from AWS.
+
+    Args:
+        state: Only list instances in this state, e.g. "running" or "stopped".
+        refresh: Bypass the cache and reload the instances from AWS.
+    """
+    if not refresh and inventory.is_fresh():
+        # Served from memory, no need for a thread pool round trip
+        return inventory.list_instances(state)
+
+    try:
+        return await run_ec2_call(inventory.list_instances, state, refresh)
+    except Exception as e:
+        return f"Failed to list EC2 instances: {e}"
+
+
+# Polling interval bounds (in seconds) of wait_for_aws_ec2_instances_running.
+# The interval starts small, grows while nothing changes and drops back to the
+# minimum as soon as an instance changes state.
+EC2_WAIT_MIN_INTERVAL = float(os.getenv("EC2_WAIT_MIN_INTERVAL", "2"))
+EC2_WAIT_MAX_INTERVAL = float(os.getenv("EC2_WAIT_MAX_INTERVAL", "15"))
+
+# States an instance can not reach "running" from without outside action
+EC2_WAIT_FAILED_STATES = {"shutting-down", "terminated", "stopping", "stopped"}
+
+
+@mcp.tool()
+async def wait_for_aws_ec2_instances_running(
+    instance_ids: list[str], ctx: Context, timeout_seconds: int = 600
+):
+    """
+    Waits until the given AWS EC2 instances are running.
+    Call this once after creating instances instead of checking their state repeatedly.
+
+    Args:
+        instance_ids: IDs of the instances to wait for.
+        timeout_seconds: Maximum number of seconds to wait.
+
+    Returns the last known state of every instance and whether the wait timed out.
+    """
+    ids = list(dict.fromkeys(instance_ids))
+    if not ids:
+        return "No instance IDs provided. Please provide the instances to wait for."
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_seconds
+    interval = EC2_WAIT_MIN_INTERVAL
+    states = {instance_id: "unknown" for instance_id in ids}
+
+    while True:
+        pending = [
+            instance_id
+            for instance_id, state in states.items()
+            if state != "running" and state not in EC2_WAIT_FAILED_STATES
+        ]
+        if not pending:
+            break
+
+        try:
+            batches = await asyncio.gather(
+                *(
+                    run_ec2_call(describe_instance_states, chunk)
+                    for chunk in chunk_ids(pending, EC2_MAX_DESCRIBE_PER_CALL)
+                )
+            )
+        except Exception as e:
+            # A failed poll is not fatal, the next round will try again
+            await ctx.warning(f"Failed to describe EC2 instances: {e}")
+            batches = []
+
+        changed = False
+        for batch in batches:
+            for instance_id, state in batch.items():
+                if states[instance_id] != state:
+                    states[instance_id] = state
+                    changed = True
+
+        done = sum(
+            1
+            for state in states.values()
+            if state == "running" or state in EC2_WAIT_FAILED_STATES
+        )
+        await ctx.report_progress(done, len(ids))
+        if done == len(ids):
+            break
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return {"timed_out": True, "states": states}
+
+        if changed:
+            interval = EC2_WAIT_MIN_INTERVAL
+        else:
+            interval = min(interval * 2, EC2_WAIT_MAX_INTERVAL)
+        await asyncio.sleep(min(interval, remaining))
+
+    return {"timed_out": False, "states": states}
+
+
+@mcp.resource("ec2://stats/api-calls", mime_type="application/json")
+def ec2_api_call_stats() -> dict:
+    """Per EC2 API action counters of calls, throttles, retries and failures."""
+    return get_ec2_call_stats()
+
+
 if __name__ == "__main__":
     # Initialize and run the server
 
-    print("Starting FastMCP server...")
-    mcp.run(transport="stdio")
+    if warm_pool is not None:
+        print(f"Starting EC2 warm pool of {warm_pool.size} instances...")
+        warm_pool.start()
+
+    # MCP_TRANSPORT=sse serves the tools over HTTP/SSE (on FASTMCP_HOST and
+    # FASTMCP_PORT) so several agent workers can share this one process
+    transport = os.getenv("MCP_TRANSPORT", "stdio")
+    # The tools launch and terminate instances without any authentication, so
+    # they are only served on loopback unless FASTMCP_HOST says otherwise
+    mcp.settings.host = os.getenv("FASTMCP_HOST", "127.0.0.1")
+    print(f"Starting FastMCP server over {transport}...")
+    mcp.run(transport=transport)
     print("FastMCP server is running.")
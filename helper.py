@@ -1,20 +1,431 @@
 import boto3
-import sys
+import hashlib
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
 from dotenv import load_dotenv
 import os
 
-def create_ec2_instance():
+try:
+    import fcntl
+except ImportError:  # Windows, the warm pool then relies on a single process
+    fcntl = None
+
+# Load properties from .env file once, instead of on every EC2 call
+load_dotenv()
+
+# Connection pool settings shared by every cached EC2 client
+EC2_MAX_POOL_CONNECTIONS = int(os.getenv('EC2_MAX_POOL_CONNECTIONS', '10'))
+EC2_TCP_KEEPALIVE = os.getenv('EC2_TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes')
+
+# Optional EC2 endpoint override, e.g. a local moto or LocalStack server
+EC2_ENDPOINT_URL = os.getenv('EC2_ENDPOINT_URL') or None
+
+_ec2_clients = {}
+_ec2_clients_lock = threading.Lock()
+
+
+def get_ec2_client(region_name=None):
+    """
+    Returns a cached EC2 client for the given region and the current credentials.
+
+    Clients are created lazily on first use and reused across calls, so the
+    credential resolution, endpoint setup and HTTPS connection pool are paid
+    once per region/credential pair instead of once per tool call. boto3
+    clients are thread-safe, so the same client is shared by all threads.
+    """
+    if region_name is None:
+        region_name = os.getenv('AWS_REGION', '<your value>')
+
+    key = (
+        region_name,
+        os.getenv('AWS_ACCESS_KEY_ID'),
+        os.getenv('AWS_SECRET_ACCESS_KEY'),
+        os.getenv('AWS_SESSION_TOKEN'),
+    )
+
+    client = _ec2_clients.get(key)
+    if client is not None:
+        return client
+
+    with _ec2_clients_lock:
+        client = _ec2_clients.get(key)
+        if client is None:
+            config = Config(
+                max_pool_connections=EC2_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=EC2_TCP_KEEPALIVE,
+                # Retries, connection errors included, are done by call_ec2, which
+                # also rate limits them
+                retries={'mode': 'standard', 'total_max_attempts': 1},
+            )
+            # boto3.client() uses a shared default session which is not
+            # thread-safe, so clients are built on a dedicated session.
+            session = boto3.session.Session()
+            client = session.client(
+                'ec2',
+                region_name=region_name,
+                endpoint_url=EC2_ENDPOINT_URL,
+                config=config,
+            )
+            _ec2_clients[key] = client
+        return client
+
+
+# Client-side rate limits as (requests per second, burst) per EC2 API action.
+# Mutating actions get much smaller buckets on the EC2 side than describe
+# calls, so they are limited harder here as well.
+EC2_RATE_LIMIT = float(os.getenv('EC2_RATE_LIMIT', '20'))
+EC2_RATE_BURST = float(os.getenv('EC2_RATE_BURST', '50'))
+EC2_ACTION_RATE_LIMITS = {
+    'RunInstances': (2, 5),
+    'StartInstances': (5, 20),
+    'StopInstances': (5, 20),
+    'TerminateInstances': (5, 20),
+    'CreateTags': (5, 20),
+}
+
+# Retries of throttled, transiently failing or unreachable calls, with full-jitter
+# exponential backoff between attempts
+EC2_MAX_RETRIES = int(os.getenv('EC2_MAX_RETRIES', '5'))
+EC2_RETRY_BASE_DELAY = float(os.getenv('EC2_RETRY_BASE_DELAY', '0.5'))
+EC2_RETRY_MAX_DELAY = float(os.getenv('EC2_RETRY_MAX_DELAY', '20'))
+
+THROTTLING_ERROR_CODES = {
+    'RequestLimitExceeded',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+}
+TRANSIENT_ERROR_CODES = {'InternalError', 'ServiceUnavailable', 'Unavailable'}
+# Failed connections and read timeouts, e.g. EndpointConnectionError, ReadTimeoutError
+CONNECTION_ERRORS = (BotoConnectionError, HTTPClientError)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adaptive refill rate.
+
+    The rate is halved every time EC2 throttles a call and creeps back up to
+    the configured rate while calls succeed, so bursts slow down to what the
+    account can sustain instead of failing.
+    """
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+_ec2_call_stats = {}
+_ec2_call_stats_lock = threading.Lock()
+
+
+def _get_rate_limiter(region_name, action):
+    key = (region_name, action)
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(key)
+        if bucket is None:
+            rate, burst = EC2_ACTION_RATE_LIMITS.get(action, (EC2_RATE_LIMIT, EC2_RATE_BURST))
+            bucket = TokenBucket(rate, burst)
+            _rate_limiters[key] = bucket
+        return bucket
+
+
+def _count(action, counter):
+    with _ec2_call_stats_lock:
+        stats = _ec2_call_stats.setdefault(
+            action, {'calls': 0, 'throttles': 0, 'retries': 0, 'failures': 0}
+        )
+        stats[counter] += 1
+
+
+def get_ec2_call_stats():
+    """Returns {action: {'calls', 'throttles', 'retries', 'failures'}} counters."""
+    with _ec2_call_stats_lock:
+        return {action: dict(stats) for action, stats in _ec2_call_stats.items()}
+
+
+def call_ec2(ec2, operation, **params):
+    """
+    Calls an EC2 API operation through the shared rate limiter.
+
+    Every attempt takes a token from the bucket of its region and action.
+    Throttling, transient server errors and connection errors are retried
+    with jittered exponential backoff; any other error, or the last failed
+    attempt, is raised to the caller.
+
+    An operation with an idempotency token (e.g. ClientToken of
+    run_instances) that the caller left out gets one generated here and
+    reused on every attempt, so retrying a call that may already have
+    succeeded on the server cannot launch duplicates.
+
+    Args:
+        ec2: Client returned by get_ec2_client.
+        operation (str): Client method name, e.g. 'run_instances'.
+        **params: Parameters of the API call.
+    """
+    action = ec2.meta.method_to_api_mapping.get(operation, operation)
+    bucket = _get_rate_limiter(ec2.meta.region_name, action)
+    method = getattr(ec2, operation)
+
+    # Botocore would generate a fresh token on every call
+    for member in ec2.meta.service_model.operation_model(action).idempotent_members:
+        if member not in params:
+            params[member] = str(uuid.uuid4())
+
+    attempt = 0
+    while True:
+        bucket.acquire()
+        _count(action, 'calls')
+        try:
+            response = method(**params)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            throttled = code in THROTTLING_ERROR_CODES
+            if throttled:
+                _count(action, 'throttles')
+                bucket.on_throttle()
+
+            if not (throttled or code in TRANSIENT_ERROR_CODES) or attempt >= EC2_MAX_RETRIES:
+                _count(action, 'failures')
+                raise
+            reason = code
+        except CONNECTION_ERRORS as e:
+            if attempt >= EC2_MAX_RETRIES:
+                _count(action, 'failures')
+                raise
+            reason = type(e).__name__
+        except Exception:
+            _count(action, 'failures')
+            raise
+        else:
+            bucket.on_success()
+            return response
+
+        delay = random.uniform(0, min(EC2_RETRY_MAX_DELAY, EC2_RETRY_BASE_DELAY * 2 ** attempt))
+        print(f"{action} failed with {reason}, retrying in {delay:.2f}s")
+        attempt += 1
+        _count(action, 'retries')
+        time.sleep(delay)
+
+
+def paginate_ec2(ec2, operation, **params):
+    """Yields every page of a paginated EC2 operation, each fetched via call_ec2."""
+    while True:
+        page = call_ec2(ec2, operation, **params)
+        yield page
+        next_token = page.get('NextToken')
+        if not next_token:
+            return
+        params['NextToken'] = next_token
+
+
+# Seconds a listing of the instance inventory is served from memory before
+# describe_instances is called again
+EC2_INVENTORY_TTL = float(os.getenv('EC2_INVENTORY_TTL', '30'))
+
+
+def _summarize_instance(instance):
+    """Reduces a describe/run_instances instance dict to the fields we report."""
+    launch_time = instance.get('LaunchTime')
+    return {
+        'instance_id': instance['InstanceId'],
+        'state': instance.get('State', {}).get('Name', 'unknown'),
+        'instance_type': instance.get('InstanceType'),
+        'image_id': instance.get('ImageId'),
+        'launch_time': launch_time.isoformat() if launch_time else None,
+        'private_ip': instance.get('PrivateIpAddress'),
+        'public_ip': instance.get('PublicIpAddress'),
+        'tags': {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])},
+    }
+
+
+class InstanceInventory:
+    """
+    In-process cache of the EC2 instances of the configured region.
+
+    A full listing is refreshed with a paginated describe_instances call once
+    the TTL has expired. Instances created or terminated through this module
+    are written through to the cache straight away, so the cache stays
+    accurate between refreshes without calling the EC2 API.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._instances = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        # Only one thread refreshes at a time, the others wait and reuse it
+        self._refresh_lock = threading.Lock()
+
+    def is_fresh(self):
+        refreshed_at = self._refreshed_at
+        return refreshed_at is not None and time.monotonic() - refreshed_at < self.ttl
+
+    def refresh(self):
+        """Reloads every instance of the region from describe_instances."""
+        region_name = os.getenv('AWS_REGION', '<your value>')
+        ec2 = get_ec2_client(region_name)
+
+        instances = {}
+        for page in paginate_ec2(ec2, 'describe_instances', MaxResults=1000):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    summary = _summarize_instance(instance)
+                    instances[summary['instance_id']] = summary
+
+        with self._lock:
+            self._instances = instances
+            self._refreshed_at = time.monotonic()
+
+    def list_instances(self, state=None, force_refresh=False):
+        """
+        Returns the cached instances, refreshing them first if the TTL expired.
+
+        Args:
+            state (str): Only return instances in this state (e.g. 'running').
+            force_refresh (bool): Refresh even if the cache is still fresh.
+        """
+        if force_refresh or not self.is_fresh():
+            with self._refresh_lock:
+                # Another thread may have refreshed while we were waiting
+                if force_refresh or not self.is_fresh():
+                    self.refresh()
+
+        with self._lock:
+            instances = [dict(instance) for instance in self._instances.values()]
+
+        if state is not None:
+            instances = [instance for instance in instances if instance['state'] == state]
+        return instances
+
+    def record_instances(self, instances):
+        """Writes instance dicts returned by run_instances through to the cache."""
+        with self._lock:
+            for instance in instances:
+                summary = _summarize_instance(instance)
+                self._instances[summary['instance_id']] = summary
+
+    def record_states(self, states):
+        """Writes {instance_id: state_name} changes through to the cache."""
+        with self._lock:
+            for instance_id, state in states.items():
+                if instance_id in self._instances:
+                    self._instances[instance_id]['state'] = state
+                else:
+                    self._instances[instance_id] = {'instance_id': instance_id, 'state': state}
+
+
+inventory = InstanceInventory(EC2_INVENTORY_TTL)
+
+
+# Seconds an idempotency key keeps returning the result of its first launch.
+# EC2 itself honours a ClientToken for at least a few hours; the local table
+# only saves the run_instances round trip for recent retries.
+EC2_IDEMPOTENCY_TTL = float(os.getenv('EC2_IDEMPOTENCY_TTL', '3600'))
+
+_recent_launches = {}
+_recent_launches_lock = threading.Lock()
+
+
+def _client_token(idempotency_key, suffix=''):
+    """Derives a run_instances ClientToken (at most 64 ASCII chars) from a key."""
+    return hashlib.sha256(f"{idempotency_key}{suffix}".encode()).hexdigest()
+
+
+def _request_key(idempotency_key, **params):
+    """
+    Scopes an idempotency key to the request parameters, so reusing a key for a
+    different request launches it instead of returning the other one's result.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+    return f"{idempotency_key}:{digest.hexdigest()[:16]}"
+
+
+def _lookup_launch(key):
+    """Returns the recorded result of a launch with this key, or None."""
+    with _recent_launches_lock:
+        entry = _recent_launches.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del _recent_launches[key]
+            return None
+        return result
+
+
+def _record_launch(key, result):
+    """Remembers the result of a launch and prunes expired keys."""
+    now = time.monotonic()
+    with _recent_launches_lock:
+        for expired in [k for k, (expires_at, _) in _recent_launches.items() if expires_at < now]:
+            del _recent_launches[expired]
+        _recent_launches[key] = (now + EC2_IDEMPOTENCY_TTL, result)
+
+
+def create_ec2_instance(idempotency_key=None):
     """
     This function creates an EC2 instance in AWS.
 
     Ensure you have your AWS credentials configured properly (either via
     environment variables, a configuration file, or an IAM role).  You will
     also need to specify the correct AMI ID, instance type, and security group.
+
+    Args:
+        idempotency_key (str): Optional key identifying this launch, e.g. an
+            A2A task ID and message number. Retries with the same key return the instance of the
+            first launch instead of launching a new one.
     """
 
-    # Load properties from .env file
+    if idempotency_key:
+        instance_id = _lookup_launch(('instance', idempotency_key))
+        if instance_id is not None:
+            print(f"Reusing EC2 instance {instance_id} for idempotency key {idempotency_key}")
+            return instance_id
 
-    load_dotenv()  # Load environment variables from .env file
+    # Hand out a pre-provisioned instance when the warm pool has one ready
+    if warm_pool is not None:
+        instance_id = warm_pool.acquire()
+        if instance_id is not None:
+            if idempotency_key:
+                _record_launch(('instance', idempotency_key), instance_id)
+            return instance_id
 
     # Retrieve properties from the environment
     ami_id = os.getenv('AMI_ID', '<your value>')  # Default value if not set
@@ -23,10 +434,8 @@ def create_ec2_instance():
     security_group_ids = os.getenv('SECURITY_GROUP_IDS', '<your value>').split(',')
     region_name = os.getenv('AWS_REGION', '<your value>')
 
-    # Update the EC2 client with the region from the .env file
-    ec2 = boto3.client('ec2', region_name=region_name)
-    # Initialize the EC2 client using boto3
-     # Change to your desired region
+    # Reuse the cached EC2 client for the region from the .env file
+    ec2 = get_ec2_client(region_name)
 
     # Define the parameters for the EC2 instance
     #  * ImageId:  The Amazon Machine Image (AMI) ID.  Choose an AMI that
@@ -44,8 +453,16 @@ def create_ec2_instance():
     #  * TagSpecifications:  Optional tags to apply to the instance.  Tags
     #     are key-value pairs that can help you organize and manage your
     #     AWS resources.
+    #  * ClientToken:  Makes the request idempotent, EC2 returns the
+    #     instance of the first request instead of launching a new one.
+    extra_params = {}
+    if idempotency_key:
+        extra_params['ClientToken'] = _client_token(idempotency_key)
+
     try:
-        response = ec2.run_instances(
+        response = call_ec2(
+            ec2,
+            'run_instances',
             ImageId=ami_id,  # Example: Ubuntu 20.04 (replace with your desired AMI)
             InstanceType=instance_type,          # Example
             MinCount=1,
@@ -66,11 +483,15 @@ def create_ec2_instance():
                         }
                     ]
                 }
-            ]
+            ],
+            **extra_params,
         )
 
         # Extract the instance ID from the response
         instance_id = response['Instances'][0]['InstanceId']
+        inventory.record_instances(response['Instances'])
+        if idempotency_key:
+            _record_launch(('instance', idempotency_key), instance_id)
         print(f"EC2 instance created with ID: {instance_id}")
         return instance_id  # Return the Instance ID
 
@@ -78,22 +499,156 @@ def create_ec2_instance():
         print(f"Error creating EC2 instance: {e}")
         return None # Return None in case of Error
 
+# Upper bound of instances requested by a single run_instances call. Larger
+# batches are split into several calls so one call never exceeds the account
+# limit for a single launch request.
+EC2_MAX_INSTANCES_PER_CALL = int(os.getenv('EC2_MAX_INSTANCES_PER_CALL', '20'))
+# Upper bound of instances launched by one create_ec2_instances request
+EC2_MAX_INSTANCES_PER_REQUEST = int(os.getenv('EC2_MAX_INSTANCES_PER_REQUEST', '20'))
+
+DEFAULT_INSTANCE_TAGS = {
+    'Name': 'MyPyEc2Instance-mcp',
+    'Environment': 'Staging',
+}
+
+
+def _to_tag_list(tags):
+    """Converts a {key: value} dict into the EC2 [{'Key', 'Value'}] tag format."""
+    return [{'Key': key, 'Value': str(value)} for key, value in tags.items()]
+
+
+def create_ec2_instances(count, tags=None, instance_tags=None, idempotency_key=None):
+    """
+    Creates `count` EC2 instances with as few run_instances calls as possible.
+
+    Instances are requested in chunks of at most EC2_MAX_INSTANCES_PER_CALL.
+    When EC2 launches fewer instances than asked for (MinCount is 1), the
+    remainder is requested in the next call. Launching stops at the first
+    failed call and the error is reported alongside the instances that were
+    already created.
+
+    Args:
+        count (int): Number of instances to launch.
+        tags (dict): Tags applied to every instance, merged over the default tags.
+        instance_tags (list[dict]): Optional per-instance tags, where the n-th
+            dict is applied to the n-th launched instance.
+        idempotency_key (str): Optional key identifying this batch. Every
+            run_instances call gets a ClientToken derived from it and the
+            batch parameters, and a successful batch is returned as is when
+            retried with the same key and parameters.
+
+    Returns:
+        dict: {'requested': int, 'instance_ids': [str], 'errors': [str]}
+    """
+    if count > EC2_MAX_INSTANCES_PER_REQUEST:
+        return {
+            'requested': count,
+            'instance_ids': [],
+            'errors': [f"At most {EC2_MAX_INSTANCES_PER_REQUEST} instances can be created per request"],
+        }
+
+    if idempotency_key:
+        idempotency_key = _request_key(
+            idempotency_key, count=count, tags=tags, instance_tags=instance_tags
+        )
+        previous = _lookup_launch(('batch', idempotency_key))
+        if previous is not None:
+            print(f"Reusing EC2 instances {previous['instance_ids']} for idempotency key {idempotency_key}")
+            return previous
+
+    ami_id = os.getenv('AMI_ID', '<your value>')
+    instance_type = os.getenv('INSTANCE_TYPE', '<your value>')
+    key_name = os.getenv('KEY_NAME', '<your value>')
+    security_group_ids = os.getenv('SECURITY_GROUP_IDS', '<your value>').split(',')
+    region_name = os.getenv('AWS_REGION', '<your value>')
+
+    ec2 = get_ec2_client(region_name)
+
+    common_tags = dict(DEFAULT_INSTANCE_TAGS)
+    common_tags.update(tags or {})
+
+    result = {'requested': count, 'instance_ids': [], 'errors': []}
+
+    while len(result['instance_ids']) < count:
+        chunk = min(count - len(result['instance_ids']), EC2_MAX_INSTANCES_PER_CALL)
+        extra_params = {}
+        if idempotency_key:
+            # The n-th call of a retried batch reuses the n-th token
+            extra_params['ClientToken'] = _client_token(
+                idempotency_key, f"-{len(result['instance_ids'])}-{chunk}"
+            )
+        try:
+            response = call_ec2(
+                ec2,
+                'run_instances',
+                ImageId=ami_id,
+                InstanceType=instance_type,
+                MinCount=1,
+                MaxCount=chunk,
+                KeyName=key_name,
+                SecurityGroupIds=list(security_group_ids),
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'instance',
+                        'Tags': _to_tag_list(common_tags),
+                    }
+                ],
+                **extra_params,
+            )
+        except Exception as e:
+            print(f"Error creating EC2 instances: {e}")
+            result['errors'].append(str(e))
+            break
+
+        launched = [instance['InstanceId'] for instance in response['Instances']]
+        inventory.record_instances(response['Instances'])
+        print(f"Launched {len(launched)} EC2 instances: {launched}")
+        result['instance_ids'].extend(launched)
+
+    if instance_tags:
+        # Group instances sharing the same extra tags so each distinct tag set
+        # costs a single create_tags call.
+        groups = {}
+        for instance_id, extra_tags in zip(result['instance_ids'], instance_tags):
+            if extra_tags:
+                groups.setdefault(tuple(sorted(extra_tags.items())), []).append(instance_id)
+
+        for extra_tags, instance_ids in groups.items():
+            try:
+                call_ec2(
+                    ec2,
+                    'create_tags',
+                    Resources=instance_ids,
+                    Tags=_to_tag_list(dict(extra_tags)),
+                )
+            except Exception as e:
+                print(f"Error tagging EC2 instances {instance_ids}: {e}")
+                result['errors'].append(f"Tagging {instance_ids} failed: {e}")
+
+    if idempotency_key and not result['errors']:
+        _record_launch(('batch', idempotency_key), result)
+    return result
+
 def terminate_ec2_instance(instance_id):
     """
     Terminates the EC2 instance with the given ID.
 
     Args:
         instance_id (str): The ID of the EC2 instance to terminate.
+
+    Returns:
+        bool: True if the termination request succeeded, False otherwise.
     """
 
-    load_dotenv()
     region_name = os.getenv('AWS_REGION', '<your value>')
-    # Initialize the EC2 client
-    ec2 = boto3.client('ec2', region_name=region_name)
+    # Reuse the cached EC2 client
+    ec2 = get_ec2_client(region_name)
 
     try:
         # Terminate the instance
-        response = ec2.terminate_instances(
+        response = call_ec2(
+            ec2,
+            'terminate_instances',
             InstanceIds=[instance_id]
         )
 
@@ -103,10 +658,339 @@ def terminate_ec2_instance(instance_id):
             print(f"  Instance ID: {instance['InstanceId']}")
             print(f"  Previous State: {instance['PreviousState']['Name']}")
             print(f"  Current State: {instance['CurrentState']['Name']}")
+        inventory.record_states({
+            instance['InstanceId']: instance['CurrentState']['Name']
+            for instance in response['TerminatingInstances']
+        })
+        return True
 
     except Exception as e:
+        # Report the failure instead of exiting, which would kill the MCP server
         print(f"Error terminating instance {instance_id}: {e}")
-        sys.exit(1)
+        return False
+
+
+# terminate_instances accepts at most 1000 IDs per call
+EC2_MAX_TERMINATE_PER_CALL = int(os.getenv('EC2_MAX_TERMINATE_PER_CALL', '100'))
+
+
+def chunk_ids(instance_ids, size):
+    """Splits a list of instance IDs into consecutive chunks of at most `size` IDs."""
+    return [instance_ids[i:i + size] for i in range(0, len(instance_ids), size)]
+
+
+def find_instance_ids_by_tags(tags):
+    """
+    Returns the IDs of all non-terminated instances carrying every given tag.
+
+    Args:
+        tags (dict): {key: value} tags the instances must match.
+    """
+    region_name = os.getenv('AWS_REGION', '<your value>')
+    ec2 = get_ec2_client(region_name)
+
+    filters = [{'Name': f'tag:{key}', 'Values': [str(value)]} for key, value in tags.items()]
+    filters.append({
+        'Name': 'instance-state-name',
+        'Values': ['pending', 'running', 'stopping', 'stopped'],
+    })
+
+    instance_ids = []
+    for page in paginate_ec2(ec2, 'describe_instances', Filters=filters):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                instance_ids.append(instance['InstanceId'])
+    return instance_ids
+
+
+def terminate_ec2_instance_chunk(instance_ids):
+    """
+    Terminates a chunk of instances with a single terminate_instances call.
+
+    If the call fails (for example because one of the IDs does not exist),
+    every instance of the chunk is retried on its own so that a single bad ID
+    only fails itself.
+
+    Args:
+        instance_ids (list[str]): IDs to terminate, at most 1000.
+
+    Returns:
+        dict: {instance_id: {'previous_state', 'current_state'} or {'error'}}
+    """
+    region_name = os.getenv('AWS_REGION', '<your value>')
+    ec2 = get_ec2_client(region_name)
+
+    try:
+        response = call_ec2(ec2, 'terminate_instances', InstanceIds=list(instance_ids))
+    except Exception as e:
+        if len(instance_ids) == 1:
+            print(f"Error terminating instance {instance_ids[0]}: {e}")
+            return {instance_ids[0]: {'error': str(e)}}
+
+        summary = {}
+        for instance_id in instance_ids:
+            summary.update(terminate_ec2_instance_chunk([instance_id]))
+        return summary
+
+    summary = {}
+    for instance in response['TerminatingInstances']:
+        summary[instance['InstanceId']] = {
+            'previous_state': instance['PreviousState']['Name'],
+            'current_state': instance['CurrentState']['Name'],
+        }
+    print(f"Terminating instances: {list(summary)}")
+    inventory.record_states({
+        instance_id: states['current_state'] for instance_id, states in summary.items()
+    })
+    return summary
+
+# describe_instances accepts at most 200 values per filter
+EC2_MAX_DESCRIBE_PER_CALL = int(os.getenv('EC2_MAX_DESCRIBE_PER_CALL', '200'))
+
+
+def describe_instance_states(instance_ids):
+    """
+    Returns the current state name of each given instance.
+
+    The IDs are passed as an instance-id filter rather than InstanceIds, so
+    instances that EC2 does not know about yet (right after run_instances)
+    are simply missing from the result instead of failing the whole call.
+
+    Args:
+        instance_ids (list[str]): At most EC2_MAX_DESCRIBE_PER_CALL IDs.
+
+    Returns:
+        dict: {instance_id: state_name}
+    """
+    region_name = os.getenv('AWS_REGION', '<your value>')
+    ec2 = get_ec2_client(region_name)
+
+    states = {}
+    for page in paginate_ec2(
+        ec2,
+        'describe_instances',
+        Filters=[{'Name': 'instance-id', 'Values': list(instance_ids)}],
+    ):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                states[instance['InstanceId']] = instance['State']['Name']
+    inventory.record_states(states)
+    return states
+
+
+# Number of stopped, pre-provisioned instances kept ready by the warm pool.
+# 0 disables the warm pool and every create is a cold run_instances.
+EC2_WARM_POOL_SIZE = int(os.getenv('EC2_WARM_POOL_SIZE', '0'))
+EC2_WARM_POOL_INTERVAL = float(os.getenv('EC2_WARM_POOL_INTERVAL', '30'))
+
+WARM_POOL_TAG = 'mcp-warm-pool'
+
+
+class WarmPool:
+    """
+    Keeps a number of stopped instances of one AMI/instance type ready.
+
+    Pool members carry the `mcp-warm-pool` tag set to '<ami_id>:<instance_type>'.
+    acquire() removes the tag from a stopped member, starts it and returns its
+    ID, which skips the launch and first boot of a cold run_instances. A
+    background thread replenishes the pool: it launches missing members and
+    stops them once they are running. The pool state is rebuilt from EC2 on
+    every round, so it survives restarts and runs against any EC2 endpoint
+    (pass `ec2` or set EC2_ENDPOINT_URL to use a local stubbed backend).
+
+    EC2 has no conditional tag update to claim a member with, so only one
+    process may run a pool: the first one to take a file lock in the temp
+    directory owns it, e.g. one of several `aws.py` servers of an agent's
+    MCP pool, and the others launch instances cold. Across hosts, enable the
+    pool on one host only.
+    """
+
+    def __init__(self, size, ami_id, instance_type, key_name=None,
+                 security_group_ids=None, interval=EC2_WARM_POOL_INTERVAL, ec2=None):
+        self.size = size
+        self.ami_id = ami_id
+        self.instance_type = instance_type
+        self.key_name = key_name
+        self.security_group_ids = security_group_ids
+        self.interval = interval
+        self.pool_id = f"{ami_id}:{instance_type}"
+        self._ec2 = ec2
+        self._ready = []
+        self._handed_out = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._owner = None
+        self._lock_file = None
+
+    def _is_owner(self):
+        """Whether this process runs the pool, taking the pool's file lock on first use."""
+        if self._owner is None:
+            self._owner = True
+            if fcntl is not None:
+                digest = hashlib.sha256(self.pool_id.encode()).hexdigest()[:16]
+                path = os.path.join(tempfile.gettempdir(), f'mcp-warm-pool-{digest}.lock')
+                self._lock_file = open(path, 'w')
+                try:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    self._owner = False
+                    self._lock_file.close()
+                    self._lock_file = None
+                    print(f"EC2 warm pool {self.pool_id} is run by another process")
+        return self._owner
+
+    def _client(self):
+        return self._ec2 if self._ec2 is not None else get_ec2_client()
+
+    def ready_count(self):
+        with self._lock:
+            return len(self._ready)
+
+    def acquire(self):
+        """
+        Starts a stopped pool member and returns its ID, or None if the pool
+        has no member ready (the caller then launches a new instance).
+        """
+        if not self._is_owner():
+            return None
+
+        ec2 = self._client()
+        while True:
+            with self._lock:
+                if not self._ready:
+                    return None
+                instance_id = self._ready.pop(0)
+                self._handed_out.add(instance_id)
+
+            try:
+                # Untag first so the replenisher no longer counts it as a member
+                call_ec2(ec2, 'delete_tags', Resources=[instance_id],
+                         Tags=[{'Key': WARM_POOL_TAG}])
+                call_ec2(ec2, 'create_tags', Resources=[instance_id],
+                         Tags=_to_tag_list(DEFAULT_INSTANCE_TAGS))
+                response = call_ec2(ec2, 'start_instances', InstanceIds=[instance_id])
+            except Exception as e:
+                print(f"Error starting warm pool instance {instance_id}: {e}")
+                self._return_member(ec2, instance_id)
+                continue
+            finally:
+                self._wake.set()
+
+            inventory.record_states({
+                instance['InstanceId']: instance['CurrentState']['Name']
+                for instance in response['StartingInstances']
+            })
+            print(f"EC2 instance {instance_id} handed out from the warm pool")
+            return instance_id
+
+    def _return_member(self, ec2, instance_id):
+        """
+        Puts back a member whose hand-out failed halfway, or terminates it when
+        even that fails, so no untagged stopped instance is left behind.
+        """
+        try:
+            call_ec2(ec2, 'create_tags', Resources=[instance_id],
+                     Tags=_to_tag_list({WARM_POOL_TAG: self.pool_id}))
+        except Exception as e:
+            print(f"Error returning {instance_id} to the warm pool, terminating it: {e}")
+            try:
+                call_ec2(ec2, 'terminate_instances', InstanceIds=[instance_id])
+            except Exception as e:
+                # Left handed out, the next rounds keep ignoring it
+                print(f"Could not terminate warm pool instance {instance_id}: {e}")
+                return
+        with self._lock:
+            self._handed_out.discard(instance_id)
+
+    def replenish(self):
+        """Brings the pool back to its size, one reconciliation round."""
+        if not self._is_owner():
+            return
+        ec2 = self._client()
+        members = {}
+        for page in paginate_ec2(
+            ec2,
+            'describe_instances',
+            Filters=[
+                {'Name': f'tag:{WARM_POOL_TAG}', 'Values': [self.pool_id]},
+                {'Name': 'instance-state-name',
+                 'Values': ['pending', 'running', 'stopping', 'stopped']},
+            ],
+        ):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    members[instance['InstanceId']] = instance['State']['Name']
+
+        with self._lock:
+            # Handed out members are untagged, forget them once EC2 agrees
+            self._handed_out &= set(members)
+            for instance_id in self._handed_out:
+                del members[instance_id]
+            self._ready = [i for i, state in members.items() if state == 'stopped']
+
+        running = [i for i, state in members.items() if state == 'running']
+        if running:
+            call_ec2(ec2, 'stop_instances', InstanceIds=running)
+
+        missing = self.size - len(members)
+        if missing > 0:
+            params = {}
+            if self.key_name:
+                params['KeyName'] = self.key_name
+            if self.security_group_ids:
+                params['SecurityGroupIds'] = list(self.security_group_ids)
+            response = call_ec2(
+                ec2,
+                'run_instances',
+                ImageId=self.ami_id,
+                InstanceType=self.instance_type,
+                MinCount=1,
+                MaxCount=missing,
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'instance',
+                        'Tags': _to_tag_list({
+                            'Name': 'MyPyEc2Instance-mcp-warm',
+                            WARM_POOL_TAG: self.pool_id,
+                        }),
+                    }
+                ],
+                **params,
+            )
+            print(f"Launched {len(response['Instances'])} EC2 instances for the warm pool")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.replenish()
+            except Exception as e:
+                print(f"Error replenishing the warm pool: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """Starts replenishing the pool in a background thread, if this process owns it."""
+        if self._thread is None and self._is_owner():
+            self._thread = threading.Thread(target=self._run, name='ec2-warm-pool', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+
+warm_pool = None
+if EC2_WARM_POOL_SIZE > 0:
+    warm_pool = WarmPool(
+        EC2_WARM_POOL_SIZE,
+        os.getenv('AMI_ID', '<your value>'),
+        os.getenv('INSTANCE_TYPE', '<your value>'),
+        key_name=os.getenv('KEY_NAME'),
+        security_group_ids=[i for i in os.getenv('SECURITY_GROUP_IDS', '').split(',') if i],
+    )
+
 
 if __name__ == "__main__":
     # Example usage
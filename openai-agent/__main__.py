@@ -11,7 +11,7 @@ from common.types import AgentCapabilities, AgentCard, AgentSkill, MissingAPIKey
 from starlette.applications import Starlette
 from common.server.task_manager import TaskManager
 from starlette.applications import Starlette
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from sse_starlette.sse import EventSourceResponse
 from starlette.requests import Request
 
@@ -34,6 +34,13 @@ from pydantic import ValidationError
 import json
 from typing import AsyncIterable, Any
 from common.server.task_manager import TaskManager
+from common.server.utils import (
+    CachedJSONDocument,
+    is_batch_request,
+    is_json_parse_error,
+    new_json_response,
+    process_batch_request,
+)
 
 import logging
 
@@ -44,7 +51,10 @@ from dotenv import load_dotenv
 import os
 import contextlib
 from typing import AsyncIterator, TypedDict
-from agents.mcp import MCPServer, MCPServerStdio
+from agents.mcp import MCPServer
+from mcp_servers import MCPServerPool, create_mcp_server
+from common.server.task_store import create_task_store
+from common.server.push_notifications import PushNotificationSender
 
 load_dotenv()
 
@@ -62,22 +72,11 @@ async def lifespan(app: Starlette) -> AsyncIterator[State]:
     This lifespan function is called during the startup of starlette app and yields all values untill all
     Yield statement. Once the starlette app shuts down, it executes the staement after the Yield statement
 
-    This function start's the MCP server with below command locally and closes it once the starlette server shuts down
+    This function start's the MCP server with below command locally and closes it once the starlette server shuts down.
+    When MCP_SERVER_URL is set, it connects to the shared MCP server over HTTP/SSE instead
 
     """
-    root_dir = os.path.dirname(os.getcwd())
-    async with MCPServerStdio(
-        name="AWS ec2 agent",
-        params={
-            "command": "uv",
-            "args": [
-                "--directory",
-                root_dir,
-                "run",
-                "aws.py",
-            ],
-        },
-    ) as server:
+    async with create_mcp_server() as server:
 
         yield {"mcp_server": server}
 
@@ -95,15 +94,45 @@ class MyA2AServer:
         self.host = host
         self.port = port
         self.endpoint = endpoint
-        self.task_manager = None
+        self.task_manager = task_manager
+        self.mcp_server: MCPServer | None = None
+        self.task_store = create_task_store()
+        self.push_sender = PushNotificationSender()
 
         self.agent_card = agent_card
-        self.app = Starlette(lifespan=lifespan)
+        self.agent_card_document = (
+            CachedJSONDocument(agent_card) if agent_card is not None else None
+        )
+        self.app = Starlette(lifespan=self._lifespan)
 
         self.app.add_route(self.endpoint, self._process_request, methods=["POST"])
         self.app.add_route(
             "/.well-known/agent.json", self._get_agent_card, methods=["GET"]
         )
+        self.app.add_route("/stats", self._get_stats, methods=["GET"])
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: Starlette) -> AsyncIterator[State]:
+        async with lifespan(app) as state:
+            self.mcp_server = state["mcp_server"]
+            # Wired once, the task manager holds the state of every task
+            if self.task_manager is None:
+                self.task_manager = AgentTaskManager(
+                    agent=OpenAiAgent(state["mcp_server"]),
+                    task_store=self.task_store,
+                    push_sender=self.push_sender,
+                )
+            yield state
+            # Stopped first, queued and running tasks still write to the
+            # task store and call the MCP server
+            if isinstance(self.task_manager, AgentTaskManager):
+                await self.task_manager.close()
+
+        # Pending push notifications are dropped on shutdown, buffered task
+        # writes are not
+        await self.push_sender.close()
+        if self.task_store is not None:
+            await self.task_store.close()
 
     def start(self):
         if self.agent_card is None:
@@ -113,53 +142,69 @@ class MyA2AServer:
 
         uvicorn.run(self.app, host=self.host, port=self.port)
 
-    def _get_agent_card(self, request: Request) -> JSONResponse:
-        ##instantiate the mcp server on first request and initialize the AgemntManager
-
-        mcp_server = request.state.mcp_server
-        self.task_manager = AgentTaskManager(agent=OpenAiAgent(mcp_server))
-
-        return JSONResponse(self.agent_card.model_dump(exclude_none=True))
+    def _get_agent_card(self, request: Request) -> Response:
+        return self.agent_card_document.response(request)
+
+    def _get_stats(self, request: Request) -> JSONResponse:
+        """Runtime counters of the server's components, for monitoring."""
+        stats = {}
+        if isinstance(self.mcp_server, MCPServerPool):
+            stats["mcp_pool"] = self.mcp_server.stats()
+        if self.task_manager is not None:
+            stats["tasks"] = {
+                "stored": len(self.task_manager.tasks),
+                "evictions": dict(self.task_manager.eviction_stats),
+            }
+            stats["tools_version"] = getattr(self.task_manager.agent, "tools_version", 0)
+            fast_path_router = getattr(self.task_manager.agent, "fast_path_router", None)
+            if fast_path_router is not None:
+                stats["fast_path"] = fast_path_router.stats()
+        return JSONResponse(stats)
 
     async def _process_request(self, request: Request):
         try:
-            body = await request.json()
-            json_rpc_request = A2ARequest.validate_python(body)
-            logger.info(f"Request recvd on <process_request>....{json_rpc_request}")
-
-            if isinstance(json_rpc_request, GetTaskRequest):
-                result = await self.task_manager.on_get_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SendTaskRequest):
-                result = await self.task_manager.on_send_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SendTaskStreamingRequest):
-                result = await self.task_manager.on_send_task_subscribe(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, CancelTaskRequest):
-                result = await self.task_manager.on_cancel_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SetTaskPushNotificationRequest):
-                result = await self.task_manager.on_set_task_push_notification(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, GetTaskPushNotificationRequest):
-                result = await self.task_manager.on_get_task_push_notification(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, TaskResubscriptionRequest):
-                result = await self.task_manager.on_resubscribe_to_task(
-                    json_rpc_request
-                )
-            else:
-                logger.warning(f"Unexpected request type: {type(json_rpc_request)}")
-                raise ValueError(f"Unexpected request type: {type(request)}")
-
+            body = await request.body()
+            if is_batch_request(body):
+                responses = await process_batch_request(body, self._dispatch)
+                status_code = 400 if isinstance(responses, JSONRPCResponse) else 200
+                return new_json_response(responses, status_code=status_code)
+
+            # Validated straight from the body bytes, the JSON is parsed once
+            json_rpc_request = A2ARequest.validate_json(body)
+            result = await self._dispatch(json_rpc_request)
             return self._create_response(result)
 
         except Exception as e:
             return self._handle_exception(e)
 
-    def _handle_exception(self, e: Exception) -> JSONResponse:
-        if isinstance(e, json.decoder.JSONDecodeError):
+    async def _dispatch(self, json_rpc_request) -> Any:
+        logger.info(f"Request recvd on <process_request>....{json_rpc_request}")
+        if isinstance(json_rpc_request, GetTaskRequest):
+            result = await self.task_manager.on_get_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SendTaskRequest):
+            result = await self.task_manager.on_send_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SendTaskStreamingRequest):
+            result = await self.task_manager.on_send_task_subscribe(json_rpc_request)
+        elif isinstance(json_rpc_request, CancelTaskRequest):
+            result = await self.task_manager.on_cancel_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SetTaskPushNotificationRequest):
+            result = await self.task_manager.on_set_task_push_notification(
+                json_rpc_request
+            )
+        elif isinstance(json_rpc_request, GetTaskPushNotificationRequest):
+            result = await self.task_manager.on_get_task_push_notification(
+                json_rpc_request
+            )
+        elif isinstance(json_rpc_request, TaskResubscriptionRequest):
+            result = await self.task_manager.on_resubscribe_to_task(json_rpc_request)
+        else:
+            logger.warning(f"Unexpected request type: {type(json_rpc_request)}")
+            raise ValueError(f"Unexpected request type: {type(json_rpc_request)}")
+
+        return result
+
+    def _handle_exception(self, e: Exception) -> Response:
+        if isinstance(e, ValidationError) and is_json_parse_error(e):
             json_rpc_error = JSONParseError()
         elif isinstance(e, ValidationError):
             json_rpc_error = InvalidRequestError(data=json.loads(e.json()))
@@ -168,9 +213,9 @@ class MyA2AServer:
             json_rpc_error = InternalError()
 
         response = JSONRPCResponse(id=None, error=json_rpc_error)
-        return JSONResponse(response.model_dump(exclude_none=True), status_code=400)
+        return new_json_response(response, status_code=400)
 
-    def _create_response(self, result: Any) -> JSONResponse | EventSourceResponse:
+    def _create_response(self, result: Any) -> Response | EventSourceResponse:
         if isinstance(result, AsyncIterable):
 
             async def event_generator(result) -> AsyncIterable[dict[str, str]]:
@@ -179,7 +224,7 @@ class MyA2AServer:
 
             return EventSourceResponse(event_generator(result))
         elif isinstance(result, JSONRPCResponse):
-            return JSONResponse(result.model_dump(exclude_none=True))
+            return new_json_response(result)
         else:
             logger.error(f"Unexpected result type: {type(result)}")
             raise ValueError(f"Unexpected result type: {type(result)}")
@@ -195,7 +240,7 @@ def main(host, port):
         if not os.getenv("OPENAI_API_KEY"):
             raise MissingAPIKeyError("OPENAI_API_KEY environment variable not set.")
 
-        capabilities = AgentCapabilities(streaming=False)
+        capabilities = AgentCapabilities(streaming=True, pushNotifications=True)
 
         skill = AgentSkill(
             id="aws_ec2_initializer_or_terminator",
@@ -221,9 +266,7 @@ def main(host, port):
             skills=[skill],
         )
 
-        server = MyA2AServer(
-            agent_card=agent_card, task_manager=AgentTaskManager(agent=OpenAiAgent())
-        )
+        server = MyA2AServer(agent_card=agent_card)
 
         logger.info(f"Starting server on {host}:{port}")
         server.start()
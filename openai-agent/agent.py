@@ -1,7 +1,11 @@
 from apply_env import apply_env
-from agents import Agent, Runner
+from agents import Agent, RunContextWrapper, Runner
+from openai.types.responses import ResponseTextDeltaEvent
+from typing import Any, AsyncIterable
 from agents.mcp import MCPServer
+from fast_path import FastPathRouter, default_router
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,31 +16,134 @@ class OpenAiAgent:
 
     SUPPORTED_CONTENT_TYPES = ["text", "text/plain"]
 
-    def __init__(self, mcp_server: MCPServer = None):
+    def __init__(
+        self, mcp_server: MCPServer = None, fast_path_router: FastPathRouter = None
+    ):
         self.mcp_server = mcp_server
         apply_env()
+        # Built once and reused by every invoke, the MCP server caches its tool list
+        self.agent = build_agent(mcp_server)
+        # Tool names of the MCP server and the tools_version they were read at
+        self._tool_names: set[str] | None = None
+        self._tool_names_version: int | None = None
 
-    async def invoke(self, query) -> str:
-        """Execute the openAI agent"""
-        return await run_agent(query, self.mcp_server)
+        # Well-formed commands skip the LLM, set FAST_PATH_ENABLED=false to disable
+        fast_path_enabled = os.getenv("FAST_PATH_ENABLED", "true").lower()
+        if fast_path_router is None and fast_path_enabled in ("1", "true", "yes"):
+            fast_path_router = default_router()
+        self.fast_path_router = fast_path_router if mcp_server is not None else None
 
+    @property
+    def tools_version(self) -> int:
+        """Version of the MCP server's tool list, bumped when the server reports a change."""
+        return getattr(self.mcp_server, "tools_version", 0)
 
-async def run_agent(user_query=None, mcp_server: MCPServer = None) -> str:
+    async def tool_names(self) -> set[str]:
+        """Names of the MCP server's tools, read again once tools_version changes."""
+        version = self.tools_version
+        if self._tool_names is None or self._tool_names_version != version:
+            tools = await self.mcp_server.list_tools()
+            self._tool_names = {tool.name for tool in tools}
+            self._tool_names_version = version
+            logger.info("MCP tool schema version %s: %s", version, sorted(self._tool_names))
+        return self._tool_names
+
+    async def invoke(self, query, idempotency_key: str = None) -> str:
+        """
+        Execute the openAI agent. `idempotency_key` identifies the request, so
+        instances are not launched twice when the same request is run again.
+        """
+        if self.fast_path_router is not None:
+            result = await self.fast_path_router.route(
+                query, self.mcp_server, idempotency_key, await self.tool_names()
+            )
+            if result is not None:
+                return result
+
+        return await run_agent(query, self.agent, idempotency_key)
+
+    async def stream(
+        self, query, idempotency_key: str = None
+    ) -> AsyncIterable[dict[str, Any]]:
+        """
+        Execute the openAI agent and stream its progress as dicts with a
+        "type" of "tool_call", "tool_output", "token" (an LLM text delta) or
+        "final" (the whole final output), and the text as "content".
+        """
+        if self.fast_path_router is not None:
+            result = await self.fast_path_router.route(
+                query, self.mcp_server, idempotency_key, await self.tool_names()
+            )
+            if result is not None:
+                yield {"type": "final", "content": result}
+                return
+
+        result = Runner.run_streamed(
+            starting_agent=self.agent,
+            input=query,
+            context={"idempotency_key": idempotency_key},
+        )
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                if isinstance(event.data, ResponseTextDeltaEvent):
+                    yield {"type": "token", "content": event.data.delta}
+            elif event.type == "run_item_stream_event":
+                if event.item.type == "tool_call_item":
+                    tool_name = getattr(event.item.raw_item, "name", "tool")
+                    yield {"type": "tool_call", "content": f"Calling {tool_name}..."}
+                elif event.item.type == "tool_call_output_item":
+                    yield {"type": "tool_output", "content": str(event.item.output)}
+
+        yield {"type": "final", "content": result.final_output}
+
+
+def agent_instructions(run_context: RunContextWrapper[dict], agent: Agent) -> str:
     """
-    This function runs the agent along with the mcp servers
+    Builds the system prompt of the agent. When the run has an idempotency key
+    (one per message of an A2A task), it is handed to the tools so a retried
+    request does not launch duplicate instances.
+    """
+    instructions = "Use the mcp server and its tools to instanciate an AWS EC2 instance."
+    key = (run_context.context or {}).get("idempotency_key")
+    if key:
+        instructions += (
+            f" When creating instances, pass idempotency_key='{key}'."
+            f" If you create instances more than once for this request, use"
+            f" '{key}-2', '{key}-3' and so on for the later calls."
+        )
+    return instructions
+
+
+def build_agent(mcp_server: MCPServer = None) -> Agent:
+    """
+    This function builds the agent along with the mcp servers
     """
     if mcp_server is not None:
-        agent = Agent(
+        return Agent(
             name="Assistant",
-            instructions="Use the mcp server and its tools to instanciate an AWS EC2 instance.",
+            instructions=agent_instructions,
             mcp_servers=[mcp_server],
         )
-    else:
-        agent = Agent(
-            name="Assistant",
-            instructions="Use the mcp server and its tools to instanciate an AWS EC2 instance.",
-        )
 
-    result = await Runner.run(starting_agent=agent, input=user_query)
+    return Agent(
+        name="Assistant",
+        instructions=agent_instructions,
+    )
+
+
+async def run_agent(
+    user_query=None, agent: Agent = None, idempotency_key: str = None
+) -> str:
+    """
+    This function runs the agent along with the mcp servers
+    """
+    if agent is None:
+        agent = build_agent()
+
+    result = await Runner.run(
+        starting_agent=agent,
+        input=user_query,
+        context={"idempotency_key": idempotency_key},
+    )
 
     return result.final_output
@@ -0,0 +1,106 @@
+"""Microbenchmark of the JSON-RPC codec used by the A2A servers.
+
+Compares the per-request CPU time of the old path (`json.loads` then
+`A2ARequest.validate_python`, response through `model_dump` and Starlette's
+`JSONResponse`) with the current one (`A2ARequest.validate_json` on the body
+bytes, response serialized once by `new_json_response`).
+
+Run from this directory: `python benchmark_json_rpc.py [iterations]`
+"""
+
+import json
+import sys
+import time
+
+from starlette.responses import JSONResponse
+
+from common.server.utils import new_json_response
+from common.types import (
+    A2ARequest,
+    Artifact,
+    Message,
+    SendTaskResponse,
+    Task,
+    TaskState,
+    TaskStatus,
+    TextPart,
+)
+
+REQUEST_BODY = json.dumps(
+    {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tasks/send",
+        "params": {
+            "id": "5f1c1f0e6bb84a3c9f1e2d3c4b5a6978",
+            "sessionId": "0a1b2c3d4e5f60718293a4b5c6d7e8f9",
+            "acceptedOutputModes": ["text", "text/plain"],
+            "message": {
+                "role": "user",
+                "parts": [
+                    {"type": "text", "text": "Create 3 ec2 instances tagged team=infra"}
+                ],
+            },
+        },
+    }
+).encode()
+
+RESPONSE = SendTaskResponse(
+    id=1,
+    result=Task(
+        id="5f1c1f0e6bb84a3c9f1e2d3c4b5a6978",
+        sessionId="0a1b2c3d4e5f60718293a4b5c6d7e8f9",
+        status=TaskStatus(
+            state=TaskState.COMPLETED,
+            message=Message(role="agent", parts=[TextPart(text="Instances started")]),
+        ),
+        artifacts=[
+            Artifact(
+                parts=[
+                    TextPart(text=f"Instance i-0{i:016x} is pending") for i in range(3)
+                ]
+            )
+        ],
+    ),
+)
+
+
+def old_path():
+    json_rpc_request = A2ARequest.validate_python(json.loads(REQUEST_BODY))
+    return json_rpc_request, JSONResponse(RESPONSE.model_dump(exclude_none=True)).body
+
+
+def new_path():
+    json_rpc_request = A2ARequest.validate_json(REQUEST_BODY)
+    return json_rpc_request, new_json_response(RESPONSE).body
+
+
+def measure(func, iterations: int) -> float:
+    """Returns the CPU time per call in microseconds, best of three rounds."""
+    timings = []
+    for _ in range(3):
+        start = time.process_time()
+        for _ in range(iterations):
+            func()
+        timings.append((time.process_time() - start) / iterations * 1e6)
+    return min(timings)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    old_request, old_body = old_path()
+    new_request, new_body = new_path()
+    assert old_request == new_request
+    assert json.loads(old_body) == json.loads(new_body)
+
+    old_time = measure(old_path, iterations)
+    new_time = measure(new_path, iterations)
+    print(f"request + response, {iterations} iterations")
+    print(f"  json.loads + validate_python + JSONResponse: {old_time:7.2f} us")
+    print(f"  validate_json + new_json_response:           {new_time:7.2f} us")
+    print(f"  saved per request: {old_time - new_time:.2f} us ({1 - new_time / old_time:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,14 @@
 from .server import A2AServer
 from .task_manager import TaskManager, InMemoryTaskManager
+from .task_store import TaskStore, SQLiteTaskStore, create_task_store
+from .push_notifications import PushNotificationSender
 
-__all__ = ["A2AServer", "TaskManager", "InMemoryTaskManager"]
+__all__ = [
+    "A2AServer",
+    "TaskManager",
+    "InMemoryTaskManager",
+    "TaskStore",
+    "SQLiteTaskStore",
+    "create_task_store",
+    "PushNotificationSender",
+]
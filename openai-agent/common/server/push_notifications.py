@@ -0,0 +1,184 @@
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+from common.types import PushNotificationConfig, Task, TaskState
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+FINAL_STATES = (TaskState.COMPLETED, TaskState.CANCELED, TaskState.FAILED)
+
+
+class PushNotificationSender:
+    """POSTs task updates to the URLs clients registered with tasks/pushNotification/set.
+
+    Notifications are queued and sent by a fixed set of workers over one
+    shared keep-alive `httpx.AsyncClient`, so `notify` never waits on the
+    network. Once `queue_size` tasks are waiting, further non-final updates
+    are dropped. Updates of a task that are still queued are coalesced: only the
+    latest state of the task is sent, and updates of one task are sent one
+    at a time, in order. Each destination host gets at most
+    `per_destination_limit` requests at once, so one slow receiver cannot take
+    every worker. Failed deliveries (network errors, 429 and 5xx responses)
+    are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        queue_size: int | None = None,
+        worker_count: int | None = None,
+        per_destination_limit: int | None = None,
+        max_retries: int | None = None,
+        timeout: float | None = None,
+    ):
+        self.queue_size = queue_size or int(os.getenv("PUSH_QUEUE_SIZE", "1000"))
+        self.worker_count = worker_count or int(os.getenv("PUSH_WORKERS", "8"))
+        self.per_destination_limit = per_destination_limit or int(
+            os.getenv("PUSH_MAX_PER_DESTINATION", "4")
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("PUSH_MAX_RETRIES", "5"))
+        )
+        self.timeout = timeout or float(os.getenv("PUSH_TIMEOUT", "10"))
+        self.retry_base_delay = float(os.getenv("PUSH_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("PUSH_RETRY_MAX_DELAY", "30"))
+
+        # Latest undelivered update of each task, the queue only holds task IDs
+        self.pending: dict[str, tuple[Task, PushNotificationConfig]] = {}
+        self.in_flight: set[str] = set()
+        self.queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
+        self.destination_limits: dict[str, asyncio.Semaphore] = {}
+        self.client: httpx.AsyncClient | None = None
+        self.stats = {"sent": 0, "coalesced": 0, "retried": 0, "failed": 0, "dropped": 0}
+
+    def _start(self):
+        # Started lazily, the client and workers need the server's event loop
+        if self.queue is not None:
+            return
+
+        self.queue = asyncio.Queue()
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.worker_count,
+                max_keepalive_connections=self.worker_count,
+            ),
+        )
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+        ]
+
+    def notify(self, task: Task, notification_config: PushNotificationConfig):
+        """Queues a notification of the task's current state, without waiting."""
+        self._start()
+
+        if task.id in self.pending:
+            self.pending[task.id] = (task, notification_config)
+            self.stats["coalesced"] += 1
+            return
+
+        # Final updates are always queued, the receiver would wait on them forever
+        if len(self.pending) >= self.queue_size and task.status.state not in FINAL_STATES:
+            self.stats["dropped"] += 1
+            logger.warning(f"Push notification queue is full, dropping update of {task.id}")
+            return
+
+        self.pending[task.id] = (task, notification_config)
+        # A task being sent is queued again by its worker once the send is done
+        if task.id not in self.in_flight:
+            self.queue.put_nowait(task.id)
+
+    def _destination_limit(self, url: str) -> asyncio.Semaphore:
+        destination = urlsplit(url).netloc
+        if destination not in self.destination_limits:
+            self.destination_limits[destination] = asyncio.Semaphore(
+                self.per_destination_limit
+            )
+        return self.destination_limits[destination]
+
+    async def _worker(self):
+        while True:
+            task_id = await self.queue.get()
+            destination_limit = self._destination_limit(self.pending[task_id][1].url)
+            if destination_limit.locked():
+                # Leave the busy destination's update for later and serve others
+                self.queue.put_nowait(task_id)
+                await asyncio.sleep(0.05)
+                continue
+
+            task, notification_config = self.pending.pop(task_id)
+            self.in_flight.add(task_id)
+            try:
+                async with destination_limit:
+                    await self._send(task, notification_config)
+            except Exception as e:
+                logger.error(f"Error sending push notification for {task_id}: {e}")
+            finally:
+                self.in_flight.discard(task_id)
+                if task_id in self.pending:
+                    self.queue.put_nowait(task_id)
+
+    @staticmethod
+    def _headers(notification_config: PushNotificationConfig) -> dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if notification_config.token:
+            headers["X-A2A-Notification-Token"] = notification_config.token
+
+        authentication = notification_config.authentication
+        if authentication and authentication.schemes and authentication.credentials:
+            headers["Authorization"] = (
+                f"{authentication.schemes[0]} {authentication.credentials}"
+            )
+        return headers
+
+    async def _send(self, task: Task, notification_config: PushNotificationConfig):
+        body = task.model_dump_json(exclude_none=True)
+        headers = self._headers(notification_config)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(
+                    notification_config.url, content=body, headers=headers
+                )
+                if response.status_code < 400:
+                    self.stats["sent"] += 1
+                    return
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                reason = repr(e)
+
+            if attempt == self.max_retries:
+                break
+            self.stats["retried"] += 1
+            delay = random.uniform(
+                0, min(self.retry_max_delay, self.retry_base_delay * 2**attempt)
+            )
+            logger.warning(
+                f"Push notification for {task.id} failed ({reason}), retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        logger.error(
+            f"Giving up on push notification for {task.id} to {notification_config.url}"
+        )
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self.client is not None:
+            await self.client.aclose()
+        self.queue = None
+        self.client = None
@@ -1,5 +1,5 @@
 from starlette.applications import Starlette
-from starlette.responses import JSONResponse
+from starlette.responses import Response
 from sse_starlette.sse import EventSourceResponse
 from starlette.requests import Request
 
@@ -22,6 +22,13 @@ from pydantic import ValidationError
 import json
 from typing import AsyncIterable, Any
 from common.server.task_manager import TaskManager
+from common.server.utils import (
+    CachedJSONDocument,
+    is_batch_request,
+    is_json_parse_error,
+    new_json_response,
+    process_batch_request,
+)
 
 import logging
 
@@ -42,6 +49,9 @@ class A2AServer:
         self.endpoint = endpoint
         self.task_manager = task_manager
         self.agent_card = agent_card
+        self.agent_card_document = (
+            CachedJSONDocument(agent_card) if agent_card is not None else None
+        )
         self.app = Starlette()
         self.app.add_route(self.endpoint, self._process_request, methods=["POST"])
         self.app.add_route(
@@ -59,47 +69,52 @@ class A2AServer:
 
         uvicorn.run(self.app, host=self.host, port=self.port)
 
-    def _get_agent_card(self, request: Request) -> JSONResponse:
-        return JSONResponse(self.agent_card.model_dump(exclude_none=True))
+    def _get_agent_card(self, request: Request) -> Response:
+        return self.agent_card_document.response(request)
 
     async def _process_request(self, request: Request):
         try:
-            body = await request.json()
-            json_rpc_request = A2ARequest.validate_python(body)
-
-            if isinstance(json_rpc_request, GetTaskRequest):
-                result = await self.task_manager.on_get_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SendTaskRequest):
-                result = await self.task_manager.on_send_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SendTaskStreamingRequest):
-                result = await self.task_manager.on_send_task_subscribe(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, CancelTaskRequest):
-                result = await self.task_manager.on_cancel_task(json_rpc_request)
-            elif isinstance(json_rpc_request, SetTaskPushNotificationRequest):
-                result = await self.task_manager.on_set_task_push_notification(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, GetTaskPushNotificationRequest):
-                result = await self.task_manager.on_get_task_push_notification(
-                    json_rpc_request
-                )
-            elif isinstance(json_rpc_request, TaskResubscriptionRequest):
-                result = await self.task_manager.on_resubscribe_to_task(
-                    json_rpc_request
-                )
-            else:
-                logger.warning(f"Unexpected request type: {type(json_rpc_request)}")
-                raise ValueError(f"Unexpected request type: {type(request)}")
-
+            body = await request.body()
+            if is_batch_request(body):
+                responses = await process_batch_request(body, self._dispatch)
+                status_code = 400 if isinstance(responses, JSONRPCResponse) else 200
+                return new_json_response(responses, status_code=status_code)
+
+            # Validated straight from the body bytes, the JSON is parsed once
+            json_rpc_request = A2ARequest.validate_json(body)
+            result = await self._dispatch(json_rpc_request)
             return self._create_response(result)
 
         except Exception as e:
             return self._handle_exception(e)
 
-    def _handle_exception(self, e: Exception) -> JSONResponse:
-        if isinstance(e, json.decoder.JSONDecodeError):
+    async def _dispatch(self, json_rpc_request) -> Any:
+        if isinstance(json_rpc_request, GetTaskRequest):
+            result = await self.task_manager.on_get_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SendTaskRequest):
+            result = await self.task_manager.on_send_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SendTaskStreamingRequest):
+            result = await self.task_manager.on_send_task_subscribe(json_rpc_request)
+        elif isinstance(json_rpc_request, CancelTaskRequest):
+            result = await self.task_manager.on_cancel_task(json_rpc_request)
+        elif isinstance(json_rpc_request, SetTaskPushNotificationRequest):
+            result = await self.task_manager.on_set_task_push_notification(
+                json_rpc_request
+            )
+        elif isinstance(json_rpc_request, GetTaskPushNotificationRequest):
+            result = await self.task_manager.on_get_task_push_notification(
+                json_rpc_request
+            )
+        elif isinstance(json_rpc_request, TaskResubscriptionRequest):
+            result = await self.task_manager.on_resubscribe_to_task(json_rpc_request)
+        else:
+            logger.warning(f"Unexpected request type: {type(json_rpc_request)}")
+            raise ValueError(f"Unexpected request type: {type(json_rpc_request)}")
+
+        return result
+
+    def _handle_exception(self, e: Exception) -> Response:
+        if isinstance(e, ValidationError) and is_json_parse_error(e):
             json_rpc_error = JSONParseError()
         elif isinstance(e, ValidationError):
             json_rpc_error = InvalidRequestError(data=json.loads(e.json()))
@@ -108,9 +123,9 @@ class A2AServer:
             json_rpc_error = InternalError()
 
         response = JSONRPCResponse(id=None, error=json_rpc_error)
-        return JSONResponse(response.model_dump(exclude_none=True), status_code=400)
+        return new_json_response(response, status_code=400)
 
-    def _create_response(self, result: Any) -> JSONResponse | EventSourceResponse:
+    def _create_response(self, result: Any) -> Response | EventSourceResponse:
         if isinstance(result, AsyncIterable):
 
             async def event_generator(result) -> AsyncIterable[dict[str, str]]:
@@ -119,7 +134,7 @@ class A2AServer:
 
             return EventSourceResponse(event_generator(result))
         elif isinstance(result, JSONRPCResponse):
-            return JSONResponse(result.model_dump(exclude_none=True))
+            return new_json_response(result)
         else:
             logger.error(f"Unexpected result type: {type(result)}")
             raise ValueError(f"Unexpected result type: {type(result)}")
@@ -33,12 +33,20 @@ from common.types import (
     InternalError,
 )
 
-from common.server.utils import new_not_implemented_error
+from common.server.task_store import TaskStore
+from common.server.push_notifications import PushNotificationSender
+from common.server.utils import message_key
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 import asyncio
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+SSE_OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
 
 class TaskManager(ABC):
     @abstractmethod
@@ -78,26 +86,154 @@ class TaskManager(ABC):
         pass
 
 
+TERMINAL_TASK_STATES = (TaskState.COMPLETED, TaskState.CANCELED, TaskState.FAILED)
+
+
 class InMemoryTaskManager(TaskManager):
-    def __init__(self):
-        self.tasks: dict[str, Task] = {}
+    """Keeps tasks in memory, bounded in count and in the age of finished tasks.
+
+    Tasks are kept in least recently used order. Finished tasks are dropped
+    `terminal_task_ttl` seconds after they reached their final state, and when
+    more than `max_tasks` tasks are stored the least recently used ones are
+    evicted, finished tasks first. Evicting a task also drops its push
+    notification config and SSE subscribers.
+
+    Operations on a task serialize on a striped lock picked by the task ID,
+    so unrelated tasks do not contend for one global lock. `self.lock` only
+    guards store-wide work (inserting tasks and evicting them). Copies handed
+    out to callers are made after the lock is released.
+
+    With a `task_store`, every change is also written to that persistent
+    store and the in-memory tasks act as a hot cache in front of it: tasks
+    missing from memory (evicted, or created before a restart) are loaded
+    from the store. Cached tasks are never revalidated against the store, so
+    one store must not be shared by several server processes.
+
+    With a `push_sender`, every update of a task that has a push notification
+    config is sent to the client's URL.
+    """
+
+    def __init__(
+        self,
+        max_tasks: int | None = None,
+        terminal_task_ttl: float | None = None,
+        task_store: TaskStore | None = None,
+        push_sender: PushNotificationSender | None = None,
+    ):
+        self.tasks: OrderedDict[str, Task] = OrderedDict()
         self.push_notification_infos: dict[str, PushNotificationConfig] = {}
+        # Store-wide lock, per-task work uses task_lock()
         self.lock = asyncio.Lock()
+        self.task_locks = [
+            asyncio.Lock()
+            for _ in range(int(os.getenv("TASK_LOCK_STRIPES", "64")))
+        ]
         self.task_sse_subscribers: dict[str, List[asyncio.Queue]] = {}
         self.subscriber_lock = asyncio.Lock()
+        # Recent stream events of each task as (offset, event), replayed on resubscribe
+        self.task_events: dict[str, deque] = {}
+        self.event_buffer_size = int(os.getenv("TASK_EVENT_BUFFER_SIZE", "100"))
+        self.sse_queue_size = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+        self.sse_overflow_policy = os.getenv("SSE_OVERFLOW_POLICY", "coalesce")
+        if self.sse_overflow_policy not in SSE_OVERFLOW_POLICIES:
+            raise ValueError(
+                f"SSE_OVERFLOW_POLICY must be one of {', '.join(SSE_OVERFLOW_POLICIES)}"
+            )
+        self.sse_overflow_stats = {policy: 0 for policy in SSE_OVERFLOW_POLICIES}
+
+        self.max_tasks = max_tasks or int(os.getenv("TASK_STORE_MAX_TASKS", "10000"))
+        self.terminal_task_ttl = terminal_task_ttl or float(
+            os.getenv("TASK_STORE_TTL", "3600")
+        )
+        self.eviction_stats = {"ttl": 0, "lru": 0}
+        self._last_ttl_sweep = time.monotonic()
+        self.task_store = task_store
+        self.push_sender = push_sender
+
+    async def _load_task(self, task_id: str) -> Task | None:
+        """
+        Returns a task from memory, or from the task store on a cache miss.
+        Must be called with the task's lock held.
+        """
+        task = self.tasks.get(task_id)
+        if task is None and self.task_store is not None:
+            task = await self.task_store.get_task(task_id)
+            if task is not None:
+                notification_config = await self.task_store.get_push_notification_info(
+                    task_id
+                )
+                if notification_config is not None:
+                    self.push_notification_infos[task_id] = notification_config
+                async with self.lock:
+                    self.tasks[task_id] = task
+                    self._evict_expired_tasks(keep=task_id)
+        return task
+
+    def task_lock(self, task_id: str) -> asyncio.Lock:
+        """Returns the lock stripe guarding the given task."""
+        return self.task_locks[hash(task_id) % len(self.task_locks)]
+
+    def _touch(self, task_id: str):
+        """Marks a task as most recently used."""
+        self.tasks.move_to_end(task_id)
+
+    def _evict(self, task_id: str, reason: str):
+        """Drops a task and its related state."""
+        del self.tasks[task_id]
+        self.push_notification_infos.pop(task_id, None)
+        # Only dropping the list, subscribers still reading their queue finish normally
+        self.task_sse_subscribers.pop(task_id, None)
+        self.task_events.pop(task_id, None)
+        self.eviction_stats[reason] += 1
+
+    def _evict_expired_tasks(self, keep: str | None = None):
+        """
+        Applies the TTL and the size bound. Must be called with self.lock held.
+        `keep` is the task being added, its caller goes on using it, so it is
+        never evicted here, e.g. an old finished task reloaded from the store.
+        """
+        now = time.monotonic()
+        # A full TTL sweep is O(n), so it runs at most ten times per TTL
+        if now - self._last_ttl_sweep >= self.terminal_task_ttl / 10:
+            self._last_ttl_sweep = now
+            expired_before = datetime.now() - timedelta(seconds=self.terminal_task_ttl)
+            for task_id, task in list(self.tasks.items()):
+                if (
+                    task_id != keep
+                    and task.status.state in TERMINAL_TASK_STATES
+                    and task.status.timestamp < expired_before
+                ):
+                    self._evict(task_id, "ttl")
+
+        if len(self.tasks) <= self.max_tasks:
+            return
+
+        for task_id, task in list(self.tasks.items()):
+            if len(self.tasks) <= self.max_tasks:
+                return
+            if task_id != keep and task.status.state in TERMINAL_TASK_STATES:
+                self._evict(task_id, "lru")
+
+        # Only unfinished tasks are left, the bound still wins
+        for task_id in list(self.tasks):
+            if len(self.tasks) <= self.max_tasks:
+                return
+            if task_id != keep:
+                logger.warning(f"Evicting unfinished task {task_id}, task store is full")
+                self._evict(task_id, "lru")
 
     async def on_get_task(self, request: GetTaskRequest) -> GetTaskResponse:
         logger.info(f"Getting task {request.params.id}")
         task_query_params: TaskQueryParams = request.params
 
-        async with self.lock:
-            task = self.tasks.get(task_query_params.id)
+        async with self.task_lock(task_query_params.id):
+            task = await self._load_task(task_query_params.id)
             if task is None:
                 return GetTaskResponse(id=request.id, error=TaskNotFoundError())
+            self._touch(task_query_params.id)
 
-            task_result = self.append_task_history(
-                task, task_query_params.historyLength
-            )
+        # Copied outside of the lock, nothing awaits in between
+        task_result = self.append_task_history(task, task_query_params.historyLength)
 
         return GetTaskResponse(id=request.id, result=task_result)
 
@@ -105,8 +241,8 @@ class InMemoryTaskManager(TaskManager):
         logger.info(f"Cancelling task {request.params.id}")
         task_id_params: TaskIdParams = request.params
 
-        async with self.lock:
-            task = self.tasks.get(task_id_params.id)
+        async with self.task_lock(task_id_params.id):
+            task = await self._load_task(task_id_params.id)
             if task is None:
                 return CancelTaskResponse(id=request.id, error=TaskNotFoundError())
 
@@ -125,28 +261,42 @@ class InMemoryTaskManager(TaskManager):
     async def set_push_notification_info(
         self, task_id: str, notification_config: PushNotificationConfig
     ):
-        async with self.lock:
-            task = self.tasks.get(task_id)
+        async with self.task_lock(task_id):
+            task = await self._load_task(task_id)
             if task is None:
                 raise ValueError(f"Task not found for {task_id}")
 
             self.push_notification_infos[task_id] = notification_config
+            if self.task_store is not None:
+                await self.task_store.set_push_notification_info(
+                    task_id, notification_config
+                )
 
         return
 
     async def get_push_notification_info(self, task_id: str) -> PushNotificationConfig:
-        async with self.lock:
-            task = self.tasks.get(task_id)
+        async with self.task_lock(task_id):
+            task = await self._load_task(task_id)
             if task is None:
                 raise ValueError(f"Task not found for {task_id}")
 
+            if task_id not in self.push_notification_infos and self.task_store:
+                notification_config = await self.task_store.get_push_notification_info(
+                    task_id
+                )
+                if notification_config is not None:
+                    self.push_notification_infos[task_id] = notification_config
+
             return self.push_notification_infos[task_id]
 
         return
 
     async def has_push_notification_info(self, task_id: str) -> bool:
-        async with self.lock:
-            return task_id in self.push_notification_infos
+        try:
+            await self.get_push_notification_info(task_id)
+        except (KeyError, ValueError):
+            return False
+        return True
 
     async def on_set_task_push_notification(
         self, request: SetTaskPushNotificationRequest
@@ -197,9 +347,20 @@ class InMemoryTaskManager(TaskManager):
         )
 
     async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        task, _ = await self.upsert_task_message(task_send_params)
+        return task
+
+    async def upsert_task_message(
+        self, task_send_params: TaskSendParams
+    ) -> tuple[Task, bool]:
+        """
+        Creates the task or adds the message to its history. A message equal to
+        the task's last user message is a client retry and is not added again;
+        the returned flag tells whether the message is new.
+        """
         logger.info(f"Upserting task {task_send_params.id}")
-        async with self.lock:
-            task = self.tasks.get(task_send_params.id)
+        async with self.task_lock(task_send_params.id):
+            task = await self._load_task(task_send_params.id)
             if task is None:
                 task = Task(
                     id=task_send_params.id,
@@ -208,27 +369,74 @@ class InMemoryTaskManager(TaskManager):
                     status=TaskStatus(state=TaskState.SUBMITTED),
                     history=[task_send_params.message],
                 )
-                self.tasks[task_send_params.id] = task
+                async with self.lock:
+                    self.tasks[task_send_params.id] = task
+                    self._evict_expired_tasks(keep=task_send_params.id)
+                if self.task_store is not None:
+                    await self.task_store.create_task(task)
             else:
+                self._touch(task_send_params.id)
+                last_user_message = next(
+                    (m for m in reversed(task.history) if m.role == "user"), None
+                )
+                if last_user_message is not None and message_key(
+                    last_user_message
+                ) == message_key(task_send_params.message):
+                    return task, False
+
                 task.history.append(task_send_params.message)
+                if self.task_store is not None:
+                    await self.task_store.append_history(
+                        task_send_params.id, [task_send_params.message]
+                    )
 
-            return task
+            return task, True
 
     async def on_resubscribe_to_task(
         self, request: TaskResubscriptionRequest
     ) -> Union[AsyncIterable[SendTaskStreamingResponse], JSONRPCResponse]:
-        return new_not_implemented_error(request.id)
+        task_id = request.params.id
+        async with self.task_lock(task_id):
+            task = await self._load_task(task_id)
+            if task is None:
+                return JSONRPCResponse(id=request.id, error=TaskNotFoundError())
+            task_status = task.status.model_copy()
+
+        try:
+            sse_event_queue = await self.setup_sse_consumer(
+                task_id, is_resubscribe=True, offset=request.params.offset
+            )
+        except ValueError:
+            # Nothing was streamed for the task in this process, e.g. it ran
+            # before a restart, so the current status is all there is to send
+            sse_event_queue = asyncio.Queue(maxsize=0)
+            sse_event_queue.put_nowait(
+                TaskStatusUpdateEvent(id=task_id, status=task_status, final=True)
+            )
+
+        return self.dequeue_events_for_sse(request.id, task_id, sse_event_queue)
 
     async def update_store(
-        self, task_id: str, status: TaskStatus, artifacts: list[Artifact]
-    ) -> Task:
-        async with self.lock:
-            try:
-                task = self.tasks[task_id]
-            except KeyError:
+        self,
+        task_id: str,
+        status: TaskStatus,
+        artifacts: list[Artifact],
+        unless_states: tuple[TaskState, ...] = (),
+    ) -> Task | None:
+        """
+        Applies a status update to a task. When the task is in one of
+        `unless_states` it is left unchanged and None is returned; the check and
+        the write happen under the task's lock.
+        """
+        async with self.task_lock(task_id):
+            task = await self._load_task(task_id)
+            if task is None:
                 logger.error(f"Task {task_id} not found for updating the task")
                 raise ValueError(f"Task {task_id} not found")
+            if task.status.state in unless_states:
+                return None
 
+            self._touch(task_id)
             task.status = status
 
             if status.message is not None:
@@ -239,6 +447,28 @@ class InMemoryTaskManager(TaskManager):
                     task.artifacts = []
                 task.artifacts.extend(artifacts)
 
+            if self.task_store is not None:
+                await self.task_store.update_status(task_id, status)
+                if status.message is not None:
+                    await self.task_store.append_history(task_id, [status.message])
+                if artifacts:
+                    await self.task_store.append_artifacts(task_id, artifacts)
+
+            notification_config = self.push_notification_infos.get(task_id)
+            if self.push_sender is not None and notification_config is not None:
+                # Sent without the history, the lists are copied as the task keeps changing
+                self.push_sender.notify(
+                    task.model_copy(
+                        update={
+                            "history": [],
+                            "artifacts": None
+                            if task.artifacts is None
+                            else list(task.artifacts),
+                        }
+                    ),
+                    notification_config,
+                )
+
             return task
 
     def append_task_history(self, task: Task, historyLength: int | None):
@@ -250,26 +480,100 @@ class InMemoryTaskManager(TaskManager):
 
         return new_task
 
-    async def setup_sse_consumer(self, task_id: str, is_resubscribe: bool = False):
+    async def setup_sse_consumer(
+        self, task_id: str, is_resubscribe: bool = False, offset: int = 0
+    ):
+        """
+        Registers a queue for the task's stream events. On resubscribe the
+        buffered events from `offset` on are replayed into the queue first,
+        events older than the buffer are skipped.
+        """
         async with self.subscriber_lock:
+            if is_resubscribe and task_id not in self.task_events:
+                raise ValueError("Task not found for resubscription")
             if task_id not in self.task_sse_subscribers:
-                if is_resubscribe:
-                    raise ValueError("Task not found for resubscription")
-                else:
-                    self.task_sse_subscribers[task_id] = []
+                self.task_sse_subscribers[task_id] = []
+
+            sse_event_queue = asyncio.Queue(maxsize=self.sse_queue_size)
+            if is_resubscribe:
+                for event_offset, event in self.task_events[task_id]:
+                    if event_offset >= offset:
+                        self._deliver(task_id, sse_event_queue, event)
+
+                _, last_event = self.task_events[task_id][-1]
+                if self._is_last_event(last_event):
+                    # The stream is over, the replay is all the client gets. A
+                    # client that already had every event gets the last one
+                    # again, so its stream still ends
+                    if sse_event_queue.empty():
+                        sse_event_queue.put_nowait(last_event)
+                    return sse_event_queue
 
-            sse_event_queue = asyncio.Queue(maxsize=0)  # <=0 is unlimited
             self.task_sse_subscribers[task_id].append(sse_event_queue)
             return sse_event_queue
 
+    @staticmethod
+    def _is_last_event(event) -> bool:
+        return isinstance(event, JSONRPCError) or (
+            isinstance(event, TaskStatusUpdateEvent) and event.final
+        )
+
+    def _deliver(self, task_id: str, sse_event_queue: asyncio.Queue, event):
+        """
+        Puts an event on a subscriber queue without waiting. A full queue
+        belongs to a slow client and is handled by the overflow policy:
+        drop_oldest drops its oldest event, coalesce drops its pending status
+        updates superseded by newer events (then the oldest event if that is
+        not enough) and disconnect ends the client's stream with an error so
+        it resubscribes once it caught up.
+        """
+        if not sse_event_queue.full():
+            sse_event_queue.put_nowait(event)
+            return
+
+        self.sse_overflow_stats[self.sse_overflow_policy] += 1
+        if self.sse_overflow_policy == "disconnect":
+            while not sse_event_queue.empty():
+                sse_event_queue.get_nowait()
+            sse_event_queue.put_nowait(
+                InternalError(message="Subscriber fell behind, resubscribe to continue")
+            )
+            subscribers = self.task_sse_subscribers.get(task_id, [])
+            if sse_event_queue in subscribers:
+                subscribers.remove(sse_event_queue)
+            logger.warning(f"Disconnected a slow subscriber of task {task_id}")
+            return
+
+        if self.sse_overflow_policy == "coalesce":
+            pending = []
+            while not sse_event_queue.empty():
+                pending.append(sse_event_queue.get_nowait())
+            for pending_event in pending:
+                if not (
+                    isinstance(pending_event, TaskStatusUpdateEvent)
+                    and not pending_event.final
+                ):
+                    sse_event_queue.put_nowait(pending_event)
+
+        if sse_event_queue.full():
+            sse_event_queue.get_nowait()
+        sse_event_queue.put_nowait(event)
+
     async def enqueue_events_for_sse(self, task_id, task_update_event):
         async with self.subscriber_lock:
-            if task_id not in self.task_sse_subscribers:
-                return
+            events = self.task_events.get(task_id)
+            if events is None:
+                events = deque(maxlen=self.event_buffer_size)
+                self.task_events[task_id] = events
+            event_offset = events[-1][0] + 1 if events else 0
+            events.append((event_offset, task_update_event))
+
+            current_subscribers = list(self.task_sse_subscribers.get(task_id, []))
 
-            current_subscribers = self.task_sse_subscribers[task_id]
-            for subscriber in current_subscribers:
-                await subscriber.put(task_update_event)
+        # Delivery never waits on a subscriber, so one slow client cannot
+        # hold up the others or the lock
+        for subscriber in current_subscribers:
+            self._deliver(task_id, subscriber, task_update_event)
 
     async def dequeue_events_for_sse(
         self, request_id, task_id, sse_event_queue: asyncio.Queue
@@ -286,5 +590,6 @@ class InMemoryTaskManager(TaskManager):
                     break
         finally:
             async with self.subscriber_lock:
-                if task_id in self.task_sse_subscribers:
-                    self.task_sse_subscribers[task_id].remove(sse_event_queue)
+                subscribers = self.task_sse_subscribers.get(task_id, [])
+                if sse_event_queue in subscribers:
+                    subscribers.remove(sse_event_queue)
@@ -0,0 +1,300 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from pydantic_core import to_jsonable_python
+
+from common.types import Artifact, Message, PushNotificationConfig, Task, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStore(ABC):
+    """Persistent storage of tasks behind the in-memory task cache.
+
+    Writes are incremental: status changes, new history messages and new
+    artifacts are recorded on their own instead of rewriting the whole task.
+    """
+
+    @abstractmethod
+    async def create_task(self, task: Task):
+        pass
+
+    @abstractmethod
+    async def update_status(self, task_id: str, status: TaskStatus):
+        pass
+
+    @abstractmethod
+    async def append_history(self, task_id: str, messages: List[Message]):
+        pass
+
+    @abstractmethod
+    async def append_artifacts(self, task_id: str, artifacts: List[Artifact]):
+        pass
+
+    @abstractmethod
+    async def get_task(self, task_id: str) -> Task | None:
+        pass
+
+    @abstractmethod
+    async def get_session_tasks(self, session_id: str) -> List[Task]:
+        pass
+
+    @abstractmethod
+    async def set_push_notification_info(
+        self, task_id: str, notification_config: PushNotificationConfig
+    ):
+        pass
+
+    @abstractmethod
+    async def get_push_notification_info(
+        self, task_id: str
+    ) -> PushNotificationConfig | None:
+        pass
+
+    async def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    status TEXT NOT NULL,
+    metadata TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_session_id ON tasks (session_id);
+CREATE TABLE IF NOT EXISTS task_history (
+    task_id TEXT NOT NULL,
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_history_task_id ON task_history (task_id, seq);
+CREATE TABLE IF NOT EXISTS task_artifacts (
+    task_id TEXT NOT NULL,
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    artifact TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_artifacts_task_id ON task_artifacts (task_id, seq);
+CREATE TABLE IF NOT EXISTS push_notifications (
+    task_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL
+);
+"""
+
+
+class SQLiteTaskStore(TaskStore):
+    """TaskStore on a SQLite database in WAL mode.
+
+    Writes are buffered and committed in batches, one transaction per batch,
+    either when `batch_size` writes are pending or `flush_interval` seconds
+    after the first pending write. A batch that fails to commit is kept and
+    retried with the next flush, and `close` flushes whatever is left. Reads
+    flush pending writes first, so they always see every earlier write. All
+    database work runs on one dedicated
+    thread, which keeps the event loop free and the connection single-threaded.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        self._pending: list[tuple[str, tuple]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_tasks: set[asyncio.Task] = set()
+        # One flush at a time, so batches are committed in write order
+        self._flush_lock = asyncio.Lock()
+        self._connection = self._executor.submit(self._connect).result()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connection.commit()
+        return connection
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _schedule_flush(self):
+        flush_task = asyncio.get_running_loop().create_task(self._background_flush())
+        self._flush_tasks.add(flush_task)
+        flush_task.add_done_callback(self._flush_tasks.discard)
+
+    async def _background_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            # The batch is pending again, retry it later
+            if self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    max(self.flush_interval, 1.0), self._schedule_flush
+                )
+
+    def _write(self, statement: str, params: tuple):
+        self._pending.append((statement, params))
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._schedule_flush
+            )
+
+    def _commit_batch(self, batch: list[tuple[str, tuple]]):
+        with self._connection:
+            for statement, params in batch:
+                self._connection.execute(statement, params)
+
+    async def flush(self):
+        """Commits every pending write in one transaction."""
+        async with self._flush_lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, []
+            try:
+                await self._run(self._commit_batch, batch)
+            except Exception as e:
+                # Put back ahead of newer writes, nothing is lost or reordered
+                self._pending[:0] = batch
+                logger.error(f"Error writing {len(batch)} task updates: {e}")
+                raise
+
+    async def create_task(self, task: Task):
+        self._write(
+            "INSERT OR REPLACE INTO tasks (id, session_id, status, metadata, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                task.id,
+                task.sessionId,
+                task.status.model_dump_json(),
+                None
+                if task.metadata is None
+                else json.dumps(to_jsonable_python(task.metadata)),
+                time.time(),
+            ),
+        )
+        if task.history:
+            await self.append_history(task.id, task.history)
+        if task.artifacts:
+            await self.append_artifacts(task.id, task.artifacts)
+
+    async def update_status(self, task_id: str, status: TaskStatus):
+        self._write(
+            "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?",
+            (status.model_dump_json(), time.time(), task_id),
+        )
+
+    async def append_history(self, task_id: str, messages: List[Message]):
+        for message in messages:
+            self._write(
+                "INSERT INTO task_history (task_id, message) VALUES (?, ?)",
+                (task_id, message.model_dump_json()),
+            )
+
+    async def append_artifacts(self, task_id: str, artifacts: List[Artifact]):
+        for artifact in artifacts:
+            self._write(
+                "INSERT INTO task_artifacts (task_id, artifact) VALUES (?, ?)",
+                (task_id, artifact.model_dump_json()),
+            )
+
+    def _load_task(self, task_id: str) -> Task | None:
+        row = self._connection.execute(
+            "SELECT session_id, status, metadata FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        session_id, status, metadata = row
+        history = [
+            Message.model_validate_json(message)
+            for (message,) in self._connection.execute(
+                "SELECT message FROM task_history WHERE task_id = ? ORDER BY seq",
+                (task_id,),
+            )
+        ]
+        artifacts = [
+            Artifact.model_validate_json(artifact)
+            for (artifact,) in self._connection.execute(
+                "SELECT artifact FROM task_artifacts WHERE task_id = ? ORDER BY seq",
+                (task_id,),
+            )
+        ]
+        return Task(
+            id=task_id,
+            sessionId=session_id,
+            status=TaskStatus.model_validate_json(status),
+            history=history,
+            artifacts=artifacts or None,
+            metadata=None if metadata is None else json.loads(metadata),
+        )
+
+    async def get_task(self, task_id: str) -> Task | None:
+        await self.flush()
+        return await self._run(self._load_task, task_id)
+
+    def _load_session_tasks(self, session_id: str) -> List[Task]:
+        task_ids = [
+            task_id
+            for (task_id,) in self._connection.execute(
+                "SELECT id FROM tasks WHERE session_id = ? ORDER BY updated_at",
+                (session_id,),
+            )
+        ]
+        return [self._load_task(task_id) for task_id in task_ids]
+
+    async def get_session_tasks(self, session_id: str) -> List[Task]:
+        await self.flush()
+        return await self._run(self._load_session_tasks, session_id)
+
+    async def set_push_notification_info(
+        self, task_id: str, notification_config: PushNotificationConfig
+    ):
+        self._write(
+            "INSERT OR REPLACE INTO push_notifications (task_id, config) VALUES (?, ?)",
+            (task_id, notification_config.model_dump_json()),
+        )
+
+    def _load_push_notification_info(self, task_id: str) -> PushNotificationConfig | None:
+        row = self._connection.execute(
+            "SELECT config FROM push_notifications WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return None if row is None else PushNotificationConfig.model_validate_json(row[0])
+
+    async def get_push_notification_info(
+        self, task_id: str
+    ) -> PushNotificationConfig | None:
+        await self.flush()
+        return await self._run(self._load_push_notification_info, task_id)
+
+    async def close(self):
+        """Flushes every pending write and closes the database."""
+        await self.flush()
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+
+def create_task_store() -> TaskStore | None:
+    """
+    Returns a SQLiteTaskStore at TASK_STORE_PATH, or None to keep tasks in memory only.
+    """
+    path = os.getenv("TASK_STORE_PATH")
+    if not path:
+        return None
+
+    logger.info(f"Persisting tasks to {path}")
+    return SQLiteTaskStore(path)
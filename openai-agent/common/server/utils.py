@@ -1,9 +1,34 @@
 from common.types import (
+    A2ARequest,
     JSONRPCResponse,
     ContentTypeNotSupportedError,
     UnsupportedOperationError,
+    InvalidRequestError,
+    InternalError,
+    Message,
+    SendTaskStreamingRequest,
+    TaskResubscriptionRequest,
 )
-from typing import List
+from typing import Any, Awaitable, Callable, List
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import to_json
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+JSONRPC_BATCH_CONCURRENCY = int(os.getenv("JSONRPC_BATCH_CONCURRENCY", "10"))
+JSONRPC_MAX_BATCH_SIZE = int(os.getenv("JSONRPC_MAX_BATCH_SIZE", "100"))
+AGENT_CARD_MAX_AGE = int(os.getenv("AGENT_CARD_MAX_AGE", "300"))
+
+# Entries are validated one by one, so one bad entry only fails itself
+JSONRPCBatch = TypeAdapter(list[Any])
 
 
 def are_modalities_compatible(
@@ -26,3 +51,117 @@ def new_incompatible_types_error(request_id):
 
 def new_not_implemented_error(request_id):
     return JSONRPCResponse(id=request_id, error=UnsupportedOperationError())
+
+
+def is_json_parse_error(e: ValidationError) -> bool:
+    """Whether validating raw request bytes failed on the JSON itself."""
+    return any(error["type"] == "json_invalid" for error in e.errors())
+
+
+def new_json_response(
+    model: BaseModel | list[BaseModel], status_code: int = 200
+) -> Response:
+    """Serializes a response model straight to body bytes, without a dict in between."""
+    return Response(
+        to_json(model, exclude_none=True),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def message_key(message: Message) -> str:
+    """
+    Identifies a message across resends: the `idempotencyKey` the client put in
+    the message metadata, or else the message content.
+    """
+    if message.metadata and message.metadata.get("idempotencyKey"):
+        source = str(message.metadata["idempotencyKey"])
+    else:
+        source = message.model_dump_json(exclude_none=True)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def is_batch_request(body: bytes) -> bool:
+    return body.lstrip()[:1] == b"["
+
+
+async def process_batch_request(
+    body: bytes,
+    dispatch: Callable[[Any], Awaitable[Any]],
+    concurrency: int = JSONRPC_BATCH_CONCURRENCY,
+) -> list[JSONRPCResponse] | JSONRPCResponse:
+    """
+    Handles a JSON-RPC batch: the entries are dispatched concurrently, at most
+    `concurrency` at a time, and their responses are returned in request order.
+    Streaming methods cannot be answered in a batch and get an error each.
+    """
+    entries = JSONRPCBatch.validate_json(body)
+    if not entries or len(entries) > JSONRPC_MAX_BATCH_SIZE:
+        return JSONRPCResponse(
+            id=None,
+            error=InvalidRequestError(
+                message=f"A batch must hold 1 to {JSONRPC_MAX_BATCH_SIZE} requests"
+            ),
+        )
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process_entry(entry: Any) -> JSONRPCResponse:
+        entry_id = entry.get("id") if isinstance(entry, dict) else None
+        if not isinstance(entry_id, (int, str)):
+            entry_id = None
+
+        try:
+            json_rpc_request = A2ARequest.validate_python(entry)
+        except ValidationError as e:
+            return JSONRPCResponse(
+                id=entry_id, error=InvalidRequestError(data=json.loads(e.json()))
+            )
+
+        if isinstance(
+            json_rpc_request, (SendTaskStreamingRequest, TaskResubscriptionRequest)
+        ):
+            return JSONRPCResponse(
+                id=json_rpc_request.id,
+                error=InvalidRequestError(
+                    message="Streaming methods are not supported in a batch"
+                ),
+            )
+
+        async with semaphore:
+            try:
+                return await dispatch(json_rpc_request)
+            except Exception as e:
+                logger.error(f"Unhandled exception in batch entry: {e}")
+                return JSONRPCResponse(id=json_rpc_request.id, error=InternalError())
+
+    return list(await asyncio.gather(*(process_entry(entry) for entry in entries)))
+
+
+class CachedJSONDocument:
+    """
+    A JSON document that never changes, encoded once and served with an ETag.
+    Clients revalidating with If-None-Match get an empty 304 response.
+    """
+
+    def __init__(self, model: BaseModel, max_age: int = AGENT_CARD_MAX_AGE):
+        self.body = to_json(model, exclude_none=True)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+
+    def _is_not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+
+        etags = [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]
+        return "*" in etags or self.etag in etags
+
+    def response(self, request: Request) -> Response:
+        if self._is_not_modified(request):
+            return Response(status_code=304, headers=self.headers)
+
+        return Response(self.body, media_type="application/json", headers=self.headers)
@@ -126,6 +126,11 @@ class TaskQueryParams(TaskIdParams):
     historyLength: int | None = None
 
 
+class TaskResubscriptionParams(TaskIdParams):
+    # Number of the task's stream events the client already received
+    offset: int = 0
+
+
 class TaskSendParams(BaseModel):
     id: str
     sessionId: str = Field(default_factory=lambda: uuid4().hex)
@@ -221,7 +226,7 @@ class GetTaskPushNotificationResponse(JSONRPCResponse):
 
 class TaskResubscriptionRequest(JSONRPCRequest):
     method: Literal["tasks/resubscribe",] = "tasks/resubscribe"
-    params: TaskIdParams
+    params: TaskResubscriptionParams
 
 
 A2ARequest = TypeAdapter(
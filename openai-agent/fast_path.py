@@ -0,0 +1,166 @@
+"""Deterministic fast path in front of the OpenAI agent.
+
+Well-formed commands such as "create an instance of ec2" or "terminate the
+instance with id i-0abc..." map to exactly one MCP tool call. The router
+recognizes them with anchored patterns and calls the tool directly, which
+saves the LLM round trips. Anything that does not match a route exactly is
+left to the LLM.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from agents.mcp import MCPServer
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_ID_PATTERN = r"i-[0-9a-f]{8,17}"
+
+# Larger batches are left to the LLM (and the tool's own limit)
+FAST_PATH_MAX_INSTANCES = int(os.getenv("FAST_PATH_MAX_INSTANCES", "10"))
+
+
+@dataclass
+class FastPathRoute:
+    """A command pattern and the MCP tool call it stands for."""
+
+    name: str
+    pattern: re.Pattern
+    tool_name: str
+    # Builds the tool arguments from the regex match and the idempotency key
+    build_arguments: Callable[[re.Match, str | None], dict[str, Any]]
+    # Optional check of the match, a rejected match falls back to the LLM
+    accepts: Callable[[re.Match], bool] | None = None
+
+
+class FastPathRouter:
+    """Routes high-confidence commands straight to MCP tools, counting hits."""
+
+    def __init__(self, routes: list[FastPathRoute] | None = None):
+        self.routes: list[FastPathRoute] = list(routes or [])
+        self.hits: dict[str, int] = {}
+        self.misses = 0
+        self.errors = 0
+
+    def register(self, route: FastPathRoute):
+        self.routes.append(route)
+
+    def match(self, query: str) -> tuple[FastPathRoute, re.Match] | None:
+        """Returns the single route matching the whole query, or None."""
+        matches = []
+        for route in self.routes:
+            match = route.pattern.fullmatch(query.strip())
+            if match and (route.accepts is None or route.accepts(match)):
+                matches.append((route, match))
+        # Several matching routes means the command is ambiguous
+        return matches[0] if len(matches) == 1 else None
+
+    async def route(
+        self,
+        query: str,
+        mcp_server: MCPServer,
+        idempotency_key: str | None = None,
+        tool_names: set[str] | None = None,
+    ) -> str | None:
+        """
+        Calls the tool of the matching route and returns its text output, or
+        None when the query has to go through the LLM. With `tool_names`, a
+        route whose tool the server does not offer (any more) is not taken.
+        """
+        matched = self.match(query) if query else None
+        if matched is None or (
+            tool_names is not None and matched[0].tool_name not in tool_names
+        ):
+            self.misses += 1
+            return None
+
+        route, match = matched
+        try:
+            result = await mcp_server.call_tool(
+                route.tool_name, route.build_arguments(match, idempotency_key)
+            )
+        except Exception as e:
+            logger.error("Fast path %s failed, falling back to LLM: %s", route.name, e)
+            self.errors += 1
+            return None
+
+        if result.isError:
+            self.errors += 1
+            return None
+
+        self.hits[route.name] = self.hits.get(route.name, 0) + 1
+        logger.info("Fast path %s handled the request", route.name)
+        return "\n".join(
+            content.text for content in result.content if content.type == "text"
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Hit, miss and error counters and the hit rate of the router."""
+        hits = sum(self.hits.values())
+        total = hits + self.misses + self.errors
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+def _idempotency(idempotency_key: str | None) -> dict[str, Any]:
+    return {"idempotency_key": idempotency_key} if idempotency_key else {}
+
+
+def _parse_instance_ids(text: str) -> list[str]:
+    return [i.lower() for i in re.findall(INSTANCE_ID_PATTERN, text, re.IGNORECASE)]
+
+
+_POLITE = r"(?:please\s+)?(?:can you\s+|could you\s+)?"
+_AWS_EC2 = r"(?:(?:an?|one|new|aws|ec2)\s+)*"
+_IDS = rf"{INSTANCE_ID_PATTERN}(?:(?:\s*,\s*|\s+and\s+|\s+){INSTANCE_ID_PATTERN})*"
+
+DEFAULT_ROUTES = [
+    FastPathRoute(
+        name="create_instance",
+        pattern=re.compile(
+            rf"{_POLITE}(?:create|launch|initiate|spin up)\s+"
+            rf"(?:{_AWS_EC2}instance(?:\s+of\s+(?:aws\s+)?ec2)?|{_AWS_EC2}ec2)"
+            r"(?:\s+instance)?\s*(?:please)?[.!]?",
+            re.IGNORECASE,
+        ),
+        tool_name="initiate_aws_ec2_instance",
+        build_arguments=lambda match, idempotency_key: _idempotency(idempotency_key),
+    ),
+    FastPathRoute(
+        name="create_instances",
+        pattern=re.compile(
+            rf"{_POLITE}(?:create|launch|initiate|spin up)\s+(?P<count>\d+)\s+"
+            r"(?:(?:new|aws|ec2)\s+)*instances?(?:\s+of\s+(?:aws\s+)?ec2)?\s*(?:please)?[.!]?",
+            re.IGNORECASE,
+        ),
+        tool_name="initiate_aws_ec2_instances",
+        build_arguments=lambda match, idempotency_key: {
+            "count": int(match.group("count")),
+            **_idempotency(idempotency_key),
+        },
+        accepts=lambda match: 1 <= int(match.group("count")) <= FAST_PATH_MAX_INSTANCES,
+    ),
+    FastPathRoute(
+        name="terminate_instance",
+        pattern=re.compile(
+            rf"{_POLITE}terminate\s+(?:the\s+)?(?:aws\s+)?(?:ec2\s+)?instances?\s+"
+            rf"(?:with\s+)?(?:(?:the\s+)?ids?\s+)?(?P<ids>{_IDS})\s*(?:please)?[.!]?",
+            re.IGNORECASE,
+        ),
+        tool_name="terminate_aws_ec2_instances",
+        build_arguments=lambda match, idempotency_key: {
+            "instance_ids": _parse_instance_ids(match.group("ids"))
+        },
+    ),
+]
+
+
+def default_router() -> FastPathRouter:
+    return FastPathRouter(DEFAULT_ROUTES)
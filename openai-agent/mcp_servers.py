@@ -0,0 +1,339 @@
+"""Factory for the connection to the AWS MCP server.
+
+By default every process spawns its own `aws.py` over stdio. With
+`MCP_POOL_SIZE` > 1 it spawns a pool of `aws.py` subprocesses and spreads
+tool calls over them. When `MCP_SERVER_URL` is set, the agent connects to an
+already running `aws.py` served over HTTP/SSE instead, so several agent
+workers can share one long-lived tool server.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable
+
+import anyio
+from agents.mcp import MCPServer, MCPServerSse, MCPServerStdio
+from mcp import ClientSession
+from mcp.types import (
+    CallToolResult,
+    ServerNotification,
+    Tool as MCPTool,
+    ToolListChangedNotification,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _ToolListCacheMixin:
+    """
+    Caches the tool list of an MCP server until the server reports a change.
+
+    The agents SDK calls `list_tools()` before every agent run. With the cache
+    that round trip only happens once, and again after the server sends a
+    `notifications/tools/list_changed`. `tools_version` is bumped on every
+    change so callers can tell which tool schema they are looking at, and
+    `on_tools_changed` is called.
+    """
+
+    tools_version = 0
+    on_tools_changed: Callable[[], None] | None = None
+
+    async def connect(self):
+        """Connect to the server, listening for tool list changes."""
+        try:
+            read, write = await self.exit_stack.enter_async_context(self.create_streams())
+            session = await self.exit_stack.enter_async_context(
+                ClientSession(read, write, message_handler=self._handle_message)
+            )
+            await session.initialize()
+            self.session = session
+        except Exception as e:
+            logger.error(f"Error initializing MCP server: {e}")
+            await self.cleanup()
+            raise
+
+    async def call_tool(
+        self, tool_name: str, arguments: dict[str, Any] | None
+    ) -> CallToolResult:
+        """
+        Calls a tool. MCP has no way to stop a tool that is running, so when
+        the caller is cancelled (tasks/cancel) the call is left to finish and
+        its outcome is logged instead of being lost.
+        """
+        call = asyncio.ensure_future(super().call_tool(tool_name, arguments))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            call.add_done_callback(
+                lambda done: self._log_abandoned_call(tool_name, arguments, done)
+            )
+            raise
+
+    def _log_abandoned_call(
+        self, tool_name: str, arguments: dict[str, Any] | None, call: asyncio.Future
+    ):
+        if call.cancelled():
+            outcome = "cancelled"
+        elif call.exception() is not None:
+            outcome = f"failed: {call.exception()!r}"
+        else:
+            outcome = " ".join(
+                getattr(content, "text", "") for content in call.result().content
+            )
+        logger.warning(
+            "Tool call %s(%s) finished after its task was canceled: %s",
+            tool_name,
+            arguments,
+            outcome,
+        )
+
+    async def _handle_message(self, message):
+        if isinstance(message, ServerNotification) and isinstance(
+            message.root, ToolListChangedNotification
+        ):
+            logger.info("Tool list of MCP server %s changed", self.name)
+            self.invalidate_tools_cache()
+            self.tools_version += 1
+            if self.on_tools_changed is not None:
+                self.on_tools_changed()
+        await anyio.lowlevel.checkpoint()
+
+
+class CachedMCPServerStdio(_ToolListCacheMixin, MCPServerStdio):
+    def __init__(self, params, name: str | None = None):
+        super().__init__(params, cache_tools_list=True, name=name)
+
+
+class CachedMCPServerSse(_ToolListCacheMixin, MCPServerSse):
+    def __init__(self, params, name: str | None = None):
+        super().__init__(params, cache_tools_list=True, name=name)
+
+def create_mcp_server() -> MCPServer:
+    """
+    Returns the (not yet connected) MCP server for the AWS tools. Use it as an
+    async context manager to connect and clean up.
+    """
+    # e.g. http://localhost:8000/sse for `MCP_TRANSPORT=sse uv run aws.py`
+    server_url = os.getenv("MCP_SERVER_URL")
+    if server_url:
+        return CachedMCPServerSse(
+            name="AWS ec2 agent",
+            params={
+                "url": server_url,
+                # Seconds to wait on the SSE stream before a tool call is abandoned
+                "sse_read_timeout": float(os.getenv("MCP_SSE_READ_TIMEOUT", "300")),
+            },
+        )
+
+    pool_size = int(os.getenv("MCP_POOL_SIZE", "1"))
+    if pool_size > 1:
+        return MCPServerPool(create_stdio_mcp_server, pool_size)
+
+    return create_stdio_mcp_server()
+
+
+def create_stdio_mcp_server() -> MCPServer:
+    """Returns an MCP server that spawns its own `aws.py` over stdio."""
+    root_dir = os.path.dirname(os.getcwd())
+    return CachedMCPServerStdio(
+        name="AWS ec2 agent",
+        params={
+            "command": "uv",
+            "args": [
+                "--directory",
+                root_dir,
+                "run",
+                "aws.py",
+            ],
+        },
+    )
+
+
+class _PoolMember:
+    """One `aws.py` subprocess of an MCPServerPool and its bookkeeping."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.server: MCPServer | None = None
+        self.in_flight = 0
+        self.calls = 0
+        self.restarts = 0
+        self.failed = asyncio.Event()
+
+
+class MCPServerPool(MCPServer):
+    """
+    A pool of identical MCP servers that spreads tool calls over its members.
+
+    Every tool call goes to the connected member with the fewest calls in
+    flight, so concurrent agent runs no longer queue behind each other on a
+    single stdio pipe. Each member is owned by a supervisor task that connects
+    it, pings it every `health_interval` seconds and restarts it when it
+    crashes or stops answering.
+
+    `tools_version` is bumped when a member reports a tool list change and
+    when a member is restarted, as the new subprocess may serve other tools.
+    """
+
+    def __init__(
+        self,
+        server_factory: Callable[[], MCPServer],
+        size: int,
+        name: str = "AWS ec2 agent pool",
+        health_interval: float = 10.0,
+    ):
+        self.server_factory = server_factory
+        self.size = size
+        self._name = name
+        self.health_interval = health_interval
+        self.members = [_PoolMember(index) for index in range(size)]
+        self._supervisors: list[asyncio.Task] = []
+        self._member_ready = asyncio.Event()
+        # Errors of members whose first start failed, before any member was up
+        self._startup_errors: list[Exception] = []
+        self._startup_failed = asyncio.Event()
+        self.tools_version = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.cleanup()
+
+    async def connect(self):
+        """
+        Starts every member and waits until at least one of them is connected.
+        Raises the last error when the first start of every member failed.
+        """
+        self._supervisors = [
+            asyncio.create_task(self._supervise(member)) for member in self.members
+        ]
+        waiters = [
+            asyncio.create_task(self._member_ready.wait()),
+            asyncio.create_task(self._startup_failed.wait()),
+        ]
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+        if not self._member_ready.is_set():
+            await self.cleanup()
+            raise self._startup_errors[-1]
+
+    async def cleanup(self):
+        for supervisor in self._supervisors:
+            supervisor.cancel()
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        self._supervisors = []
+
+    async def _supervise(self, member: _PoolMember):
+        backoff = 1.0
+        while True:
+            member.failed.clear()
+            try:
+                # The member is connected and cleaned up in this task, as the
+                # underlying anyio task groups must be exited where entered.
+                async with self.server_factory() as server:
+                    server.on_tools_changed = self._tools_changed
+                    if member.restarts:
+                        self._tools_changed()
+                    member.server = server
+                    self._member_ready.set()
+                    backoff = 1.0
+                    await self._watch(member, server)
+            except asyncio.CancelledError:
+                member.server = None
+                raise
+            except Exception as e:
+                logger.error("MCP pool member %s failed: %s", member.index, e)
+                if member.restarts == 0 and not self._member_ready.is_set():
+                    self._startup_errors.append(e)
+                    if len(self._startup_errors) == self.size:
+                        self._startup_failed.set()
+
+            member.server = None
+            member.restarts += 1
+            logger.warning(
+                "Restarting MCP pool member %s in %.0fs", member.index, backoff
+            )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _tools_changed(self):
+        self.tools_version += 1
+
+    async def _watch(self, member: _PoolMember, server: MCPServer):
+        """Returns once the member is found to be broken."""
+        while True:
+            try:
+                await asyncio.wait_for(member.failed.wait(), self.health_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            session = getattr(server, "session", None)
+            if session is None:
+                return
+            try:
+                await asyncio.wait_for(session.send_ping(), self.health_interval)
+            except Exception as e:
+                logger.error("MCP pool member %s is not answering: %s", member.index, e)
+                return
+
+    async def _acquire(self) -> _PoolMember:
+        while True:
+            ready = [
+                member
+                for member in self.members
+                if member.server is not None and not member.failed.is_set()
+            ]
+            if ready:
+                return min(ready, key=lambda member: member.in_flight)
+
+            self._member_ready.clear()
+            await self._member_ready.wait()
+
+    async def list_tools(self) -> list[MCPTool]:
+        member = await self._acquire()
+        return await member.server.list_tools()
+
+    async def call_tool(
+        self, tool_name: str, arguments: dict[str, Any] | None
+    ) -> CallToolResult:
+        member = await self._acquire()
+        member.in_flight += 1
+        member.calls += 1
+        try:
+            return await member.server.call_tool(tool_name, arguments)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream):
+            # The subprocess went away, let the supervisor restart it
+            member.failed.set()
+            raise
+        finally:
+            member.in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        """Pool size, connected members, calls in flight and utilization."""
+        in_flight = sum(member.in_flight for member in self.members)
+        return {
+            "size": self.size,
+            "connected": sum(1 for member in self.members if member.server is not None),
+            "in_flight": in_flight,
+            "utilization": in_flight / self.size if self.size else 0.0,
+            "members": [
+                {
+                    "index": member.index,
+                    "connected": member.server is not None,
+                    "in_flight": member.in_flight,
+                    "calls": member.calls,
+                    "restarts": member.restarts,
+                }
+                for member in self.members
+            ],
+        }
@@ -1,7 +1,8 @@
 from starlette.applications import Starlette
 from starlette.responses import JSONResponse
 from agent import OpenAiAgent
-from agents.mcp import MCPServer, MCPServerStdio
+from agents.mcp import MCPServer
+from mcp_servers import create_mcp_server
 from agents import gen_trace_id, trace
 from typing import AsyncIterator, TypedDict
 import os
@@ -18,22 +19,11 @@ async def lifespan(app: Starlette) -> AsyncIterator[State]:
     This lifespan function is called during the startup of starlette app and yields all values untill all
     Yield statement. Once the starlette app shuts down, it executes the staement after the Yield statement
 
-    This function start's the MCP server with below command locally and closes it once the starlette server shuts down
+    This function start's the MCP server with below command locally and closes it once the starlette server shuts down.
+    When MCP_SERVER_URL is set, it connects to the shared MCP server over HTTP/SSE instead
 
     """
-    root_dir = os.path.dirname(os.getcwd())
-    async with MCPServerStdio(
-        name="AWS ec2 agent",
-        params={
-            "command": "uv",
-            "args": [
-                "--directory",
-                root_dir,
-                "run",
-                "aws.py",
-            ],
-        },
-    ) as server:
+    async with create_mcp_server() as server:
 
         yield {"mcp_server": server}
 
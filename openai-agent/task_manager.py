@@ -1,64 +1,316 @@
 """Agent Task Manager."""
 
+import asyncio
 import logging
+import os
 from typing import AsyncIterable, Union
 from agent import OpenAiAgent
 from common.server.task_manager import InMemoryTaskManager
+from common.server.task_store import TaskStore
+from common.server.push_notifications import PushNotificationSender
 from common.server import utils
 from common.types import (
     Artifact,
+    CancelTaskRequest,
+    CancelTaskResponse,
+    InternalError,
+    InvalidParamsError,
     JSONRPCResponse,
+    Message,
     SendTaskRequest,
     SendTaskResponse,
     SendTaskStreamingRequest,
     SendTaskStreamingResponse,
     Task,
     TaskSendParams,
+    TaskArtifactUpdateEvent,
+    TaskNotCancelableError,
+    TaskNotFoundError,
+    TaskResubscriptionParams,
+    TaskResubscriptionRequest,
     TaskState,
     TaskStatus,
+    TaskStatusUpdateEvent,
     TextPart,
 )
 
 logger = logging.getLogger(__name__)
 
+TERMINAL_STATES = (TaskState.COMPLETED, TaskState.CANCELED, TaskState.FAILED)
+
+# Seconds tasks/cancel waits for the agent run to wind down and save its
+# partial output before answering
+CANCEL_GRACE_PERIOD = 5.0
+
 
 class AgentTaskManager(InMemoryTaskManager):
-    """Agent Task Manager, handles task routing and response packing."""
+    """Agent Task Manager, handles task routing and response packing.
 
-    def __init__(self, agent: OpenAiAgent):
-        super().__init__()
+    In the default "inline" execution mode tasks/send waits for the agent run
+    and returns the completed task. In "background" mode tasks/send stores
+    the task as WORKING, queues the run for a bounded pool of workers and
+    returns right away; clients then poll tasks/get for completion.
+    """
+
+    def __init__(
+        self,
+        agent: OpenAiAgent,
+        execution_mode: str | None = None,
+        worker_count: int | None = None,
+        queue_depth: int | None = None,
+        task_store: TaskStore | None = None,
+        push_sender: PushNotificationSender | None = None,
+    ):
+        super().__init__(task_store=task_store, push_sender=push_sender)
         self.agent = agent
+        # Keeps a reference to running agent tasks so they are not garbage collected
+        self.background_tasks: set[asyncio.Task] = set()
 
-    async def _stream_generator(
-        self, request: SendTaskRequest
-    ) -> AsyncIterable[SendTaskResponse]:
-        raise NotImplementedError("Not implemented")
+        self.execution_mode = execution_mode or os.getenv(
+            "TASK_EXECUTION_MODE", "inline"
+        )
+        self.worker_count = worker_count or int(os.getenv("TASK_WORKERS", "4"))
+        self.queue_depth = queue_depth or int(os.getenv("TASK_QUEUE_DEPTH", "100"))
+        self.task_queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
 
-    async def _update_store(
-        self, task_id: str, status: TaskStatus, artifacts: list[Artifact]
-    ) -> Task:
-        async with self.lock:
+        # asyncio task of the running agent invocation of each A2A task
+        self.running_tasks: dict[str, asyncio.Task] = {}
+
+    def _track(self, task_id: str, agent_task: asyncio.Task):
+        self.running_tasks[task_id] = agent_task
+
+        def _untrack(done: asyncio.Task):
+            if self.running_tasks.get(task_id) is done:
+                del self.running_tasks[task_id]
+
+        agent_task.add_done_callback(_untrack)
+
+    @staticmethod
+    def _idempotency_key(task_send_params: TaskSendParams) -> str:
+        """
+        Identifies a message of a task. A2A tasks take follow-up messages, each
+        of them is a new request with its own key, while a resent message
+        keeps its key.
+        """
+        return f"{task_send_params.id}-{utils.message_key(task_send_params.message)}"
+
+    def _is_resend(self, task: Task, is_new_message: bool) -> bool:
+        """
+        Tells whether a request resends the task's last message and is answered
+        from the task as it is. A failed run is run again, which is safe as it
+        reuses the idempotency key.
+        """
+        if is_new_message:
+            return False
+        return task.status.state != TaskState.FAILED or task.id in self.running_tasks
+
+    async def _is_canceled(self, task_id: str) -> bool:
+        async with self.task_lock(task_id):
+            task = await self._load_task(task_id)
+            return task is not None and task.status.state == TaskState.CANCELED
+
+    async def on_cancel_task(self, request: CancelTaskRequest) -> CancelTaskResponse:
+        """
+        Cancels the running (or queued) agent invocation of a task. The task
+        moves to CANCELED and keeps the artifacts produced so far.
+        """
+        logger.info("Cancelling task %s", request.params.id)
+        task_id = request.params.id
+
+        # Marked first, so the run and the workers see why they were stopped.
+        # Checked and written under one lock, a run that completes meanwhile
+        # either keeps COMPLETED or sees CANCELED and drops its result
+        task_status = TaskStatus(state=TaskState.CANCELED)
+        try:
+            task = await self._update_store(
+                task_id, task_status, None, unless_states=TERMINAL_STATES
+            )
+        except ValueError:
+            return CancelTaskResponse(id=request.id, error=TaskNotFoundError())
+        if task is None:
+            return CancelTaskResponse(id=request.id, error=TaskNotCancelableError())
+
+        agent_task = self.running_tasks.get(task_id)
+        if agent_task is not None:
+            agent_task.cancel()
+            # Let the run save its partial output. A tool call in flight is
+            # only abandoned by the client, the MCP server still finishes it
+            # and the client logs its outcome (see mcp_servers.py)
+            await asyncio.wait([agent_task], timeout=CANCEL_GRACE_PERIOD)
+
+        await self.enqueue_events_for_sse(
+            task_id, TaskStatusUpdateEvent(id=task_id, status=task_status, final=True)
+        )
+
+        task_result = self.append_task_history(task, None)
+        return CancelTaskResponse(id=request.id, result=task_result)
+
+    def _start_workers(self):
+        # Started lazily, the queue and workers need the server's event loop
+        if self.task_queue is None:
+            self.task_queue = asyncio.Queue(maxsize=self.queue_depth)
+            self.workers = [
+                asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+            ]
+
+    async def close(self):
+        """
+        Stops the workers and the running agent invocations. Called on shutdown
+        before the MCP server and the task store are closed, which the runs
+        still use.
+        """
+        agent_tasks = [
+            *self.workers,
+            *self.running_tasks.values(),
+            *self.background_tasks,
+        ]
+        for agent_task in agent_tasks:
+            agent_task.cancel()
+        await asyncio.gather(*agent_tasks, return_exceptions=True)
+        self.workers = []
+        self.task_queue = None
+
+    async def _worker(self):
+        while True:
+            request = await self.task_queue.get()
             try:
-                task = self.tasks[task_id]
-            except KeyError as exc:
-                logger.error("Task %s not found for updating the task", task_id)
-                raise ValueError(f"Task {task_id} not found") from exc
+                if await self._is_canceled(request.params.id):
+                    # Canceled while it was waiting in the queue
+                    continue
+                await self._invoke(request)
+            except Exception as e:
+                logger.error("Task %s failed: %s", request.params.id, e)
+                try:
+                    await self._update_store(
+                        request.params.id,
+                        TaskStatus(state=TaskState.FAILED),
+                        None,
+                        unless_states=(TaskState.CANCELED,),
+                    )
+                except Exception as e:
+                    # e.g. the task was evicted meanwhile, the worker carries on
+                    logger.error("Could not mark task %s failed: %s", request.params.id, e)
+            finally:
+                self.task_queue.task_done()
+
+    async def _enqueue_task(self, request: SendTaskRequest) -> SendTaskResponse:
+        self._start_workers()
+        try:
+            self.task_queue.put_nowait(request)
+        except asyncio.QueueFull:
+            logger.warning("Task queue is full, rejecting task %s", request.params.id)
+            await self._update_store(
+                request.params.id, TaskStatus(state=TaskState.FAILED), None
+            )
+            return SendTaskResponse(
+                id=request.id,
+                error=InternalError(message="Task queue is full, retry later"),
+            )
 
-            task.status = status
+        task = await self._update_store(
+            request.params.id, TaskStatus(state=TaskState.WORKING), None
+        )
+        task_result = self.append_task_history(task, request.params.historyLength)
+        return SendTaskResponse(id=request.id, result=task_result)
 
-            if status.message is not None:
-                self.task_messages[task_id].append(status.message)
+    async def _run_streaming_agent(self, request: SendTaskStreamingRequest):
+        """Runs the agent and publishes its progress to the task's SSE subscribers."""
+        task_send_params: TaskSendParams = request.params
+        task_id = task_send_params.id
+        chunk_count = 0
+        streamed_text: list[str] = []
 
-            if artifacts is not None:
-                if task.artifacts is None:
-                    task.artifacts = []
-                task.artifacts.extend(artifacts)
+        try:
+            query = self._get_user_query(task_send_params)
+            idempotency_key = self._idempotency_key(task_send_params)
+            async for item in self.agent.stream(query, idempotency_key):
+                if item["type"] in ("tool_call", "tool_output"):
+                    message = Message(
+                        role="agent", parts=[TextPart(text=item["content"])]
+                    )
+                    task_status = TaskStatus(state=TaskState.WORKING, message=message)
+                    await self._update_store(task_id, task_status, None)
+                    await self.enqueue_events_for_sse(
+                        task_id,
+                        TaskStatusUpdateEvent(id=task_id, status=task_status, final=False),
+                    )
+                elif item["type"] == "token":
+                    artifact = Artifact(
+                        parts=[TextPart(text=item["content"])],
+                        index=0,
+                        append=chunk_count > 0,
+                        lastChunk=False,
+                    )
+                    chunk_count += 1
+                    streamed_text.append(item["content"])
+                    await self.enqueue_events_for_sse(
+                        task_id, TaskArtifactUpdateEvent(id=task_id, artifact=artifact)
+                    )
+                elif item["type"] == "final":
+                    text = item["content"] or "coudnt execute OpenAI agent"
+                    task_status = TaskStatus(state=TaskState.COMPLETED)
+                    # The stored artifact holds the whole output, subscribers
+                    # that missed no chunk only need the closing one
+                    task = await self._update_store(
+                        task_id,
+                        task_status,
+                        [Artifact(parts=[TextPart(text=text)])],
+                        unless_states=(TaskState.CANCELED,),
+                    )
+                    if task is None:
+                        # Canceled as the run finished, tasks/cancel sends the final event
+                        return
+                    last_artifact = Artifact(
+                        parts=[TextPart(text="" if chunk_count else text)],
+                        index=0,
+                        append=chunk_count > 0,
+                        lastChunk=True,
+                    )
+                    await self.enqueue_events_for_sse(
+                        task_id,
+                        TaskArtifactUpdateEvent(id=task_id, artifact=last_artifact),
+                    )
+                    await self.enqueue_events_for_sse(
+                        task_id,
+                        TaskStatusUpdateEvent(id=task_id, status=task_status, final=True),
+                    )
+        except asyncio.CancelledError:
+            if streamed_text:
+                # Keep what the agent produced before tasks/cancel
+                await self._update_store(
+                    task_id,
+                    TaskStatus(state=TaskState.CANCELED),
+                    [Artifact(parts=[TextPart(text="".join(streamed_text))])],
+                )
+            raise
+        except Exception as e:
+            logger.error("An error occurred while streaming the response: %s", e)
+            task = await self._update_store(
+                task_id,
+                TaskStatus(state=TaskState.FAILED),
+                None,
+                unless_states=(TaskState.CANCELED,),
+            )
+            if task is None:
+                return
+            await self.enqueue_events_for_sse(
+                task_id,
+                InternalError(message=f"An error occurred while streaming the response: {e}"),
+            )
 
-            return task
+    async def _update_store(
+        self,
+        task_id: str,
+        status: TaskStatus,
+        artifacts: list[Artifact],
+        unless_states: tuple[TaskState, ...] = (),
+    ) -> Task | None:
+        return await self.update_store(task_id, status, artifacts, unless_states)
 
-    async def on_send_task(
-        self, request: SendTaskRequest
-    ) -> SendTaskResponse | AsyncIterable[SendTaskResponse]:
+    def _validate_request(
+        self, request: Union[SendTaskRequest, SendTaskStreamingRequest]
+    ) -> JSONRPCResponse | None:
         ## only support text output at the moment
         if not utils.are_modalities_compatible(
             request.params.acceptedOutputModes,
@@ -70,22 +322,88 @@ class AgentTaskManager(InMemoryTaskManager):
                 OpenAiAgent.SUPPORTED_CONTENT_TYPES,
             )
             return utils.new_incompatible_types_error(request.id)
+
+        # Checked up front, a failing query would only surface in the agent run
+        if not isinstance(request.params.message.parts[0], TextPart):
+            return JSONRPCResponse(
+                id=request.id,
+                error=InvalidParamsError(message="Only text parts are supported"),
+            )
+        return None
+
+    async def on_send_task(
+        self, request: SendTaskRequest
+    ) -> SendTaskResponse | AsyncIterable[SendTaskResponse]:
+        error = self._validate_request(request)
+        if error:
+            return error
         task_send_params: TaskSendParams = request.params
 
-        await self.upsert_task(task_send_params)
+        task, is_new_message = await self.upsert_task_message(task_send_params)
+        if self._is_resend(task, is_new_message):
+            logger.info("Task %s got its last message again", task_send_params.id)
+            task_result = self.append_task_history(task, task_send_params.historyLength)
+            return SendTaskResponse(id=request.id, result=task_result)
+        if self.execution_mode == "background":
+            return await self._enqueue_task(request)
         return await self._invoke(request)
 
     async def on_send_task_subscribe(
         self, request: SendTaskStreamingRequest
     ) -> Union[AsyncIterable[SendTaskStreamingResponse], JSONRPCResponse]:
-        pass
+        try:
+            error = self._validate_request(request)
+            if error:
+                return error
+
+            task, is_new_message = await self.upsert_task_message(request.params)
+            if self._is_resend(task, is_new_message):
+                # Streams the run of the first request instead of starting another
+                return await self.on_resubscribe_to_task(
+                    TaskResubscriptionRequest(
+                        id=request.id, params=TaskResubscriptionParams(id=task.id)
+                    )
+                )
+            sse_event_queue = await self.setup_sse_consumer(request.params.id, False)
+
+            agent_task = asyncio.create_task(self._run_streaming_agent(request))
+            self.background_tasks.add(agent_task)
+            agent_task.add_done_callback(self.background_tasks.discard)
+            self._track(request.params.id, agent_task)
+
+            return self.dequeue_events_for_sse(
+                request.id, request.params.id, sse_event_queue
+            )
+        except Exception as e:
+            logger.error("Error in SSE stream: %s", e)
+            return JSONRPCResponse(
+                id=request.id,
+                error=InternalError(
+                    message="An error occurred while streaming the response"
+                ),
+            )
 
     async def _invoke(self, request: SendTaskRequest) -> SendTaskResponse:
         task_send_params: TaskSendParams = request.params
         query = self._get_user_query(task_send_params)
+        idempotency_key = self._idempotency_key(task_send_params)
+
+        # Run as a separate asyncio task so tasks/cancel can cancel it
+        agent_task = asyncio.create_task(self.agent.invoke(query, idempotency_key))
+        self._track(task_send_params.id, agent_task)
 
         try:
-            result = await self.agent.invoke(query)
+            result = await agent_task
+        except asyncio.CancelledError:
+            if not agent_task.cancelled() or not await self._is_canceled(
+                task_send_params.id
+            ):
+                raise
+            # Canceled through tasks/cancel, which sets the CANCELED state
+            async with self.task_lock(task_send_params.id):
+                task = await self._load_task(task_send_params.id)
+            task = self.append_task_history(task, task_send_params.historyLength)
+            return SendTaskResponse(id=request.id, result=task)
         except Exception as e:
             logger.error("Error invoking agent: %s", e)
             raise ValueError(f"Error invoking agent: {e}") from e
@@ -99,7 +417,13 @@ class AgentTaskManager(InMemoryTaskManager):
             task_send_params.id,
             TaskStatus(state=TaskState.COMPLETED),
             [Artifact(parts=parts)],
+            unless_states=(TaskState.CANCELED,),
         )
+        if task is None:
+            # Canceled as the run finished, the cancellation stands
+            async with self.task_lock(task_send_params.id):
+                task = await self._load_task(task_send_params.id)
+            task = self.append_task_history(task, task_send_params.historyLength)
         return SendTaskResponse(id=request.id, result=task)
 
     def _get_user_query(self, task_send_params: TaskSendParams) -> str: